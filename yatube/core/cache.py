@@ -0,0 +1,32 @@
+import random
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'generation:{}'
+
+
+def _fresh():
+    # Случайное начальное значение: после вытеснения ключа из кеша
+    # поколение не повторит прежнее и не оживит устаревшие фрагменты.
+    return random.getrandbits(48)
+
+
+def generations(*names):
+    """Текущие поколения для имён; отсутствующие создаются."""
+    keys = [GENERATION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump_generation(*names):
+    """Сдвигает поколения, делая связанные с ними фрагменты устаревшими."""
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh(), None)
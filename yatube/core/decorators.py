@@ -0,0 +1,27 @@
+from functools import wraps
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def revalidated(etag_func):
+    """condition() с заголовками, по которым кеши сверяют ETag.
+
+    Страница может храниться в браузере и во фронтенд-кеше, но перед
+    каждым показом её ETag сверяется с сервером; страницы вошедших
+    пользователей хранит только браузер.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True)
+                patch_cache_control(response, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
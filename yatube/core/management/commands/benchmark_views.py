@@ -0,0 +1,132 @@
+import json
+import statistics
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from posts.models import Follow, Group, Post
+
+URL_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку, число запросов к БД и размер ответа '
+            'для всех адресов posts, users и about.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument(
+            '--output', help='Файл, в который сохраняются результаты JSON.')
+        parser.add_argument(
+            '--compare', help='Файл JSON прошлого запуска для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p50 и числа запросов (доля).')
+
+    def handle(self, *args, **options):
+        self.user, self.author, kwargs = self.sample_arguments()
+        setups = {
+            'posts:profile_follow': self.unfollow,
+            'posts:profile_unfollow': self.follow,
+        }
+        results = {}
+        for name, url in self.urls(kwargs):
+            results[name] = self.measure(
+                url, options['requests'], setups.get(name))
+            self.stdout.write(
+                f'{name:28} p50={results[name]["p50_ms"]:8.2f}ms '
+                f'p95={results[name]["p95_ms"]:8.2f}ms '
+                f'queries={results[name]["queries"]:3} '
+                f'bytes={results[name]["bytes"]}')
+        self.follow()
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def sample_arguments(self):
+        """Самый читаемый автор, его подписчик и их данные для адресов."""
+        follow = Follow.objects.order_by(
+            '-author__counter__followers_count').first()
+        post = Post.objects.order_by('-comment_count').first()
+        group = Group.objects.order_by('-posts_count').first()
+        if not (follow and post and group):
+            raise CommandError('Сначала заполните базу: seed_data.')
+        return follow.user, follow.author, {
+            'username': follow.author.username,
+            'slug': group.slug,
+            'post_id': post.pk,
+        }
+
+    def follow(self):
+        Follow.objects.get_or_create(user=self.user, author=self.author)
+
+    def unfollow(self):
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+
+    def urls(self, kwargs):
+        for module_name in URL_MODULES:
+            module = import_module(module_name)
+            for pattern in module.urlpatterns:
+                if not isinstance(pattern, URLPattern):
+                    continue
+                name = f'{module.app_name}:{pattern.name}'
+                converters = pattern.pattern.converters
+                yield name, reverse(
+                    name, kwargs={key: kwargs[key] for key in converters})
+
+    def measure(self, url, requests, setup=None):
+        """Замеры адреса; setup восстанавливает состояние перед запросом."""
+        client = Client()
+        timings, queries, sizes, statuses = [], [], [], set()
+        for _ in range(requests):
+            if setup:
+                setup()
+            client.force_login(self.user)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context))
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': percentile(timings, 0.5),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'mean_ms': statistics.mean(timings),
+            'queries': max(queries),
+            'bytes': max(sizes),
+        }
+
+    def compare(self, results, path, threshold):
+        with open(path) as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            for metric in ('p50_ms', 'queries', 'bytes'):
+                if result[metric] > before[metric] * (1 + threshold):
+                    regressions.append(
+                        f'{name} {metric}: {before[metric]} -> '
+                        f'{result[metric]}')
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий не найдено.')
@@ -0,0 +1,92 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Имена по хешу содержимого (оригиналы) или хешу источника и опций
+# (миниатюры sorl) никогда не меняют содержимого.
+IMMUTABLE_NAME_RE = re.compile(r'^[0-9a-f]{32,}\.\w+$')
+
+
+def media_file(path):
+    """Путь в MEDIA_ROOT и stat файла, который разрешено отдавать."""
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(settings.MEDIA_PUBLIC_FOLDERS):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404
+    return path, full_path, file_stat
+
+
+def file_etag(file_stat):
+    return f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+
+
+def cache_control(path):
+    if IMMUTABLE_NAME_RE.match(posixpath.basename(path)):
+        return (f'public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, '
+                'immutable')
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def strong(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(header, etag):
+    """Совпадение с If-None-Match по слабому сравнению."""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or strong(etag) in map(strong, etags)
+
+
+def byte_range(header, size):
+    """(начало, длина) одного диапазона Range, None без него.
+
+    Для неудовлетворимого диапазона возвращает (size, 0); несколько
+    диапазонов в одном запросе не поддерживаются и отдаются целиком.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = min(int(last), size)
+        return size - length, length
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        return size, 0
+    return first, last - first + 1
+
+
+def read_range(file, start, length, chunk_size=64 * 1024):
+    """Читает length байт файла с позиции start кусками."""
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
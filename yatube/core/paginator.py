@@ -0,0 +1,160 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+LAST = 'last'
+
+
+def encode_cursor(direction, obj):
+    """Непрозрачный токен курсора для ключа (pub_date, id)."""
+    raw = f'{direction}|{obj.pub_date.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен; для некорректного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница выбирается условием по ключу последней (или первой)
+    записи соседней страницы, поэтому глубокие страницы стоят
+    столько же, сколько первая. Номера страниц не вычисляются:
+    number равен 1 только у первой страницы, а num_pages лишь
+    сообщает, есть ли следующая, чтобы методы Page работали
+    без подсчёта записей. Вместо номеров страниц шаблону доступны
+    курсоры первой, предыдущей, следующей и последней страниц и
+    общее число записей, если его передали из готового счётчика.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk')):
+        # keys — поля сортировки, значения которых равны pub_date и pk
+        # объекта; для ленты подписок это поля записей ленты.
+        self.date_key, self.pk_key = keys
+        super().__init__(
+            object_list.order_by(f'-{self.date_key}', f'-{self.pk_key}'),
+            per_page,
+        )
+        self.num_pages = 1
+
+    def after(self, pub_date, pk):
+        return Q(**{f'{self.date_key}__lt': pub_date}) | Q(**{
+            self.date_key: pub_date, f'{self.pk_key}__lt': pk})
+
+    def before(self, pub_date, pk):
+        return Q(**{f'{self.date_key}__gt': pub_date}) | Q(**{
+            self.date_key: pub_date, f'{self.pk_key}__gt': pk})
+
+    def get_page(self, cursor, total=None):
+        decoded = decode_cursor(cursor)
+        queryset = self.object_list
+        if cursor == LAST:
+            direction = BACKWARD
+            rows = list(queryset.reverse()[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            has_next = False
+            rows.reverse()
+        elif decoded is None:
+            cursor, direction = '', FORWARD
+            rows = list(queryset[:self.per_page + 1])
+            has_previous = False
+            has_next = len(rows) > self.per_page
+        else:
+            direction, pub_date, pk = decoded
+            if direction == FORWARD:
+                rows = list(queryset.filter(
+                    self.after(pub_date, pk))[:self.per_page + 1])
+                has_previous = True
+                has_next = len(rows) > self.per_page
+            else:
+                rows = list(queryset.filter(
+                    self.before(pub_date, pk)
+                ).reverse()[:self.per_page + 1])
+                has_previous = len(rows) > self.per_page
+                has_next = True
+                rows.reverse()
+        if direction == BACKWARD and has_previous:
+            rows = rows[1:]
+        else:
+            rows = rows[:self.per_page]
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.cursor = cursor
+        page.next_cursor = (
+            encode_cursor(FORWARD, rows[-1]) if has_next and rows else '')
+        page.previous_cursor = (
+            encode_cursor(BACKWARD, rows[0])
+            if has_previous and rows else '')
+        page.last_cursor = LAST if has_next else ''
+        page.total = total
+        return page
+
+
+def estimated_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике базы без COUNT.
+
+    Для SQLite статистику собирает ANALYZE; если её нет, возвращается
+    None.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # Первое число stat — строки таблицы (или частичного индекса).
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        else:
+            return None
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    return max(int(float(str(stat).split()[0])) for stat, in rows)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает строки большой таблицы целиком.
+
+    Для выборки без условий число строк берётся из статистики базы,
+    если по ней в таблице больше ESTIMATED_COUNT_THRESHOLD строк;
+    отфильтрованные и небольшие выборки считаются как обычно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if (estimate is not None
+                    and estimate > settings.ESTIMATED_COUNT_THRESHOLD):
+                return estimate
+        return super().count
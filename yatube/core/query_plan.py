@@ -0,0 +1,43 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BAD_PLAN_MARKERS = ('USE TEMP B-TREE',)
+
+
+def explain(sql, params=()):
+    """Строки EXPLAIN QUERY PLAN (SQLite) для запроса."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_bad_step(step):
+    """Полный проход таблицы без индекса или сортировка во временном дереве."""
+    if any(marker in step for marker in BAD_PLAN_MARKERS):
+        return True
+    return step.startswith('SCAN') and 'USING' not in step
+
+
+def bad_plans(queries):
+    """Запросы, в планах которых есть полный проход или сортировка."""
+    problems = []
+    for sql in queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        steps = [step for step in explain(sql) if is_bad_step(step)]
+        if steps:
+            problems.append((sql, steps))
+    return problems
+
+
+class QueryPlanMixin:
+    """Проверка планов всех запросов, выполненных во время вызова."""
+
+    def assertIndexedQueries(self, func, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN поддерживается только SQLite')
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+        problems = bad_plans(query['sql'] for query in context)
+        self.assertFalse(problems, '\n\n'.join(
+            f'{sql}\n  ' + '\n  '.join(steps) for sql, steps in problems))
@@ -0,0 +1,50 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла — хеш его содержимого.
+
+    Одинаковые файлы хранятся один раз: повторное сохранение только
+    обновляет mtime уже лежащего файла и возвращает его имя. Файлы
+    раскладываются по вложенным каталогам из первых символов хеша
+    (ab/cd/abcd...), чтобы ни в одном каталоге не скапливались
+    миллионы записей.
+    """
+
+    shard_levels = 2
+    shard_width = 2
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        shards = [
+            digest[level * self.shard_width:(level + 1) * self.shard_width]
+            for level in range(self.shard_levels)
+        ]
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), *shards, digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            try:
+                # Свежий mtime не даёт сборке мусора удалить файл, пока
+                # новый пост со ссылкой на него ещё не сохранён.
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return super().save(name, content, max_length)
@@ -0,0 +1,58 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import generations
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, scopes, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.scopes = scopes
+        self.vary_on = vary_on
+
+    def render(self, context):
+        scopes = self.scopes.resolve(context)
+        if isinstance(scopes, str):
+            scopes = [scopes]
+        cache_key = make_template_fragment_key(
+            self.fragment_name,
+            generations(*scopes)
+            + [var.resolve(context) for var in self.vary_on],
+        )
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, settings.CACHE_TIME)
+        return value
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    """Кеширует фрагмент до смены поколения данных.
+
+    Использование::
+
+        {% versioned_cache fragment_name scopes [var1] [var2] .. %}
+            ..
+        {% endversioned_cache %}
+
+    scopes — имя поколения или список имён (см. core.cache). Время
+    жизни задаётся settings.CACHE_TIME.
+    """
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    return VersionedCacheNode(
+        nodelist,
+        tokens[1],
+        parser.compile_filter(tokens[2]),
+        [parser.compile_filter(t) for t in tokens[3:]],
+    )
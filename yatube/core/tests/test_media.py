@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMMUTABLE_NAME = 'posts/ab/cd/' + 'abcd' * 16 + '.jpg'
+MUTABLE_NAME = 'posts/photo.jpg'
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_ACCEL=None)
+class MediaViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (IMMUTABLE_NAME, MUTABLE_NAME, 'private/secret.txt'):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name, **headers):
+        return self.client.get(settings.MEDIA_URL + name, **headers)
+
+    def test_full_file(self):
+        response = self.get(IMMUTABLE_NAME)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('immutable', self.get(MUTABLE_NAME)['Cache-Control'])
+
+    def test_not_modified(self):
+        etag = self.get(IMMUTABLE_NAME)['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                response = self.get(
+                    IMMUTABLE_NAME, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(
+            IMMUTABLE_NAME, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_ranges(self):
+        cases = {
+            'bytes=0-9': (206, CONTENT[:10], 'bytes 0-9/1024'),
+            'bytes=1000-': (206, CONTENT[1000:], 'bytes 1000-1023/1024'),
+            'bytes=-4': (206, CONTENT[-4:], 'bytes 1020-1023/1024'),
+            'bytes=10-5000': (206, CONTENT[10:], 'bytes 10-1023/1024'),
+            'bytes=2000-': (416, b'', 'bytes */1024'),
+        }
+        for header, (status, content, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.get(IMMUTABLE_NAME, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['Content-Range'], content_range)
+                body = (b''.join(response.streaming_content)
+                        if response.streaming else response.content)
+                self.assertEqual(body, content)
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.get(
+            IMMUTABLE_NAME, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_access_checks(self):
+        for name in ('private/secret.txt', 'posts/../private/secret.txt',
+                     'posts/missing.jpg', 'posts/ab'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        self.assertEqual(self.client.post(
+            settings.MEDIA_URL + IMMUTABLE_NAME).status_code, 405)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_nginx_accel_redirect(self):
+        response = self.get(IMMUTABLE_NAME)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + IMMUTABLE_NAME)
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    @override_settings(MEDIA_ACCEL='sendfile')
+    def test_sendfile(self):
+        response = self.get(IMMUTABLE_NAME)
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(TEMP_MEDIA_ROOT, IMMUTABLE_NAME))
+        self.assertEqual(response.content, b'')
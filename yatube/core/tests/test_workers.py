@@ -0,0 +1,35 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core import workers
+
+
+@mock.patch('core.workers.transaction.on_commit', lambda func: func())
+class SubmitOnCommitTest(TestCase):
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_without_workers_job_runs_inline(self):
+        """Без фоновых потоков задача выполняется в текущем потоке."""
+        threads = []
+        workers.submit_on_commit(
+            lambda: threads.append(threading.current_thread()))
+        self.assertEqual(threads, [threading.current_thread()])
+
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_job_runs_in_background_pool(self):
+        """Задача после фиксации выполняется потоком фонового пула."""
+        done = threading.Event()
+        threads = []
+
+        def job(value):
+            threads.append((threading.current_thread().name, value))
+            done.set()
+
+        with mock.patch('core.workers._executor', None):
+            workers.submit_on_commit(job, 42)
+            self.assertTrue(done.wait(5))
+            workers.get_executor().shutdown()
+        (name, value), = threads
+        self.assertTrue(name.startswith('yatube-worker'))
+        self.assertEqual(value, 42)
@@ -0,0 +1,48 @@
+import hashlib
+import math
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """Разбивает итерируемое на списки длины size, не читая его целиком."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BloomFilter:
+    """Компактное множество строк без ложноотрицательных ответов.
+
+    Строка, которую добавили, всегда найдётся; лишняя строка найдётся
+    с вероятностью около error_rate. На элемент уходит около
+    -log2(error_rate) * 1.44 бит вместо сотни байт в set.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return (
+            (first + number * step) % self.size
+            for number in range(self.hashes)
+        )
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
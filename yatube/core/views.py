@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
 from django.shortcuts import render
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import media as media_files
 
 
 def page_not_found(request, exception):
@@ -11,3 +18,64 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@require_safe
+def media(request, path):
+    """Отдаёт файл из MEDIA_ROOT.
+
+    После проверки доступа передачу берёт на себя фронтенд-сервер
+    (X-Accel-Redirect для nginx, X-Sendfile для Apache), если он
+    указан в MEDIA_ACCEL. Иначе файл отдаётся из Python с ETag,
+    ответом 304 и поддержкой Range.
+    """
+    path, full_path, file_stat = media_files.media_file(path)
+    etag = media_files.file_etag(file_stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(file_stat.st_mtime),
+        'Cache-Control': media_files.cache_control(path),
+    }
+    if media_files.etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL == 'nginx':
+        response = HttpResponse(
+            content_type=media_files.content_type(path))
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+    elif settings.MEDIA_ACCEL == 'sendfile':
+        response = HttpResponse(
+            content_type=media_files.content_type(path))
+        response['X-Sendfile'] = full_path
+    else:
+        response = serve_file(request, path, full_path, file_stat, etag)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def serve_file(request, path, full_path, file_stat, etag):
+    size = file_stat.st_size
+    requested = media_files.byte_range(request.META.get('HTTP_RANGE'), size)
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if requested and if_range and if_range != etag:
+        requested = None
+    if requested is None:
+        response = FileResponse(
+            open(full_path, 'rb'),
+            content_type=media_files.content_type(path))
+    else:
+        start, length = requested
+        if not length:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        response = StreamingHttpResponse(
+            media_files.read_range(open(full_path, 'rb'), start, length),
+            status=206,
+            content_type=media_files.content_type(path),
+        )
+        response['Content-Range'] = (
+            f'bytes {start}-{start + length - 1}/{size}')
+        response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
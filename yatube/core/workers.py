@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+_executor = None
+
+
+def get_executor():
+    """Общий пул фоновых потоков ограниченного размера."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='yatube-worker',
+        )
+    return _executor
+
+
+def _run(func, args):
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+def submit_on_commit(func, *args):
+    """Ставит func в фоновый пул после фиксации текущей транзакции.
+
+    Без фоновых потоков (BACKGROUND_WORKERS = 0) func выполняется
+    в текущем потоке сразу после фиксации.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        transaction.on_commit(lambda: func(*args))
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run, func, args))
@@ -1,39 +1,161 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.contrib.auth import get_permission_codename
 
+from core.paginator import EstimatedCountPaginator
+from core.utils import chunked
+from core.workers import submit_on_commit
+from . import moderation
 from .models import Group, Post, Comment, Follow
+from .search import filter_posts
 
 
-class PostAdmin(admin.ModelAdmin):
+class ListRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id без подписи: подпись стоила бы запроса на каждую строку."""
+
+    def label_and_url_for_value(self, value):
+        return '', ''
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список, который не перебирает большие таблицы.
+
+    Число строк без фильтров берётся из статистики базы, второй COUNT
+    для «показать все» не выполняется, а связанные объекты в списке
+    редактируются по id, а не через <select> из всех строк.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+    def get_changelist_formset(self, request, **kwargs):
+        formset = super().get_changelist_formset(request, **kwargs)
+        for name, field in formset.form.base_fields.items():
+            if isinstance(field, forms.ModelChoiceField):
+                field.widget = ListRawIdWidget(
+                    self.model._meta.get_field(name).remote_field,
+                    self.admin_site,
+                )
+        return formset
+
+
+class ModerationDeleteMixin:
+    """Удаление через posts.moderation вместо сборщика каскадов.
+
+    Страница подтверждения не перечисляет связанные объекты, а действие
+    «Удалить в фоне» переносит удаление больших аккаунтов в фоновый пул.
+    Подклассы задают delete_function, принимающую список первичных
+    ключей, и cascaded_models — модели, строки которых удаляются
+    вместе с объектами.
+    """
+
+    actions = ['delete_in_background']
+    delete_function = None
+    cascaded_models = ()
+
+    def delete_pks(self, pks):
+        for batch in chunked(pks, settings.MODERATION_BATCH_SIZE):
+            self.delete_function(batch)
+
+    def delete_model(self, request, obj):
+        self.delete_pks([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        self.delete_pks(list(queryset.values_list('pk', flat=True)))
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        opts = self.model._meta
+        # Связанные строки не собираются, поэтому права проверяются
+        # по всем моделям, которые затронет удаление.
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (self.model, *self.cascaded_models)
+            if not request.user.has_perm('{}.{}'.format(
+                model._meta.app_label,
+                get_permission_codename('delete', model._meta)))
+        }
+        return (
+            [str(obj) for obj in objs],
+            {opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_in_background(self, request, queryset):
+        """Удаляет выбранное в фоновом пуле текущего процесса.
+
+        Очередь пула живёт в памяти и не переживает перезапуск, поэтому
+        удаление здесь не гарантировано. Надёжно удаляет команда
+        moderate_delete, она же доделывает прерванное удаление.
+        """
+        perms_needed = self.get_deleted_objects(queryset, request)[2]
+        if perms_needed:
+            self.message_user(
+                request,
+                'Нет прав на удаление: ' + ', '.join(sorted(perms_needed)),
+                messages.ERROR)
+            return
+        pks = list(queryset.values_list('pk', flat=True))
+        submit_on_commit(self.delete_pks, pks)
+        self.message_user(
+            request,
+            f'Удаление объектов ({len(pks)}) запущено в фоне. Если сервер '
+            'перезапустится раньше, повторите его командой moderate_delete.')
+    delete_in_background.short_description = 'Удалить выбранные в фоне'
+    delete_in_background.allowed_permissions = ('delete',)
+
+
+class PostAdmin(ModerationDeleteMixin, ScalableAdmin):
 
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
     list_editable = ('group',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    ordering = ('-pub_date', '-pk')
+
+    delete_function = staticmethod(moderation.delete_post_ids)
+    cascaded_models = (Comment,)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт по полнотекстовому индексу, а не LIKE.
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
 
     list_display = ('pk', 'title', 'slug', 'description')
-    search_fields = ('description',)
+    search_fields = ('title', 'description')
     empty_value_display = '-пусто-'
     prepopulated_fields = {'slug': ('title',)}
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
 
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_display = ('pk', 'text', 'pub_date', 'author', 'post')
     list_editable = ('post',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
+    ordering = ('-pub_date', '-pk')
 
 
-class FollowAdmin(admin.ModelAdmin):
-    search_fields = ('user',)
+class FollowAdmin(ScalableAdmin):
+    search_fields = ('=user__username', '=author__username')
     list_display = ('pk', 'user', 'author')
     list_editable = ('author',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    ordering = ('-pk',)
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+TOTAL_POSTS_KEY = 'posts:total'
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'follows_count': (Follow, 'user'),
+    'followers_count': (Follow, 'author'),
+}
+
+
+def count_subquery(model, field, ref='pk'):
+    """Подзапрос числа строк model, ссылающихся на внешний объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(ref)}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount_user(user_id):
+    """Пересчитывает счётчики пользователя по таблицам."""
+    values = User.objects.filter(pk=user_id).annotate(**{
+        name: count_subquery(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    }).values(*USER_COUNTERS).first()
+    if values is None:
+        return None
+    try:
+        with transaction.atomic():
+            counter, _ = UserCounter.objects.update_or_create(
+                user_id=user_id, defaults=values)
+    except IntegrityError:
+        counter = UserCounter.objects.get(user_id=user_id)
+    return counter
+
+
+def get_counter(user):
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.counter
+    except UserCounter.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def bump_user(user_id, name, delta):
+    """Атомарно сдвигает счётчик пользователя.
+
+    Отсутствующая строка при уменьшении не создаётся: пользователь
+    может удаляться вместе со счётчиками, а при чтении строка всё
+    равно будет пересчитана.
+    """
+    counters = UserCounter.objects.filter(user_id=user_id)
+    if delta < 0:
+        counters.filter(**{f'{name}__gte': -delta}).update(
+            **{name: F(name) + delta})
+    elif not counters.update(**{name: F(name) + delta}):
+        recount_user(user_id)
+
+
+def recount_followers(author_ids):
+    """Пересчитывает followers_count авторов одним UPDATE."""
+    return UserCounter.objects.filter(user_id__in=author_ids).update(
+        followers_count=count_subquery(Follow, 'author', ref='user_id'))
+
+
+def recount_follows(user_ids):
+    """Пересчитывает follows_count читателей одним UPDATE."""
+    return UserCounter.objects.filter(user_id__in=user_ids).update(
+        follows_count=count_subquery(Follow, 'user', ref='user_id'))
+
+
+def recount_posts(author_ids):
+    """Пересчитывает posts_count авторов одним UPDATE."""
+    return UserCounter.objects.filter(user_id__in=author_ids).update(
+        posts_count=count_subquery(Post, 'author', ref='user_id'))
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(
+        comment_count=F('comment_count') + delta, updated=timezone.now())
+
+
+def bump_group(group_id, delta):
+    if group_id is None:
+        return
+    groups = Group.objects.filter(pk=group_id)
+    if delta < 0:
+        groups = groups.filter(posts_count__gte=-delta)
+    groups.update(posts_count=F('posts_count') + delta)
+
+
+def total_posts():
+    """Число всех постов; COUNT выполняется только при пустом кеше.
+
+    Значение живёт TOTAL_POSTS_TTL, поэтому расхождение со счётом
+    в базе не накапливается.
+    """
+    total = cache.get(TOTAL_POSTS_KEY)
+    if total is None:
+        total = Post.objects.count()
+        cache.add(TOTAL_POSTS_KEY, total, settings.TOTAL_POSTS_TTL)
+    return total
+
+
+def bump_total_posts(delta):
+    try:
+        cache.incr(TOTAL_POSTS_KEY, delta)
+    except ValueError:
+        pass
+
+
+def recount_groups(groups=None):
+    """Пересчитывает posts_count групп одним UPDATE."""
+    if groups is None:
+        groups = Group.objects.all()
+    return groups.order_by().update(
+        posts_count=count_subquery(Post, 'group'))
+
+
+def recount_comments(posts=None):
+    """Пересчитывает comment_count постов одним UPDATE."""
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.order_by().update(
+        comment_count=count_subquery(Comment, 'post'))
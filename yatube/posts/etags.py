@@ -0,0 +1,107 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max
+
+from core.paginator import KeysetPaginator
+from .follows import is_following
+from .models import Comment, Group, Post, TimelineEntry, User
+from .recommendations import viewer_recommendations
+from .timeline import FEED_KEYS, follow_feed
+
+
+def page_etag(request, *versions):
+    """ETag страницы без рендеринга шаблона.
+
+    Складывается из зрителя, адреса с курсором и переданных версий
+    данных страницы. Версии читаются из базы, а не из поколений кеша:
+    LocMemCache у каждого процесса свой, и сдвиг поколения в одном
+    воркере не виден остальным.
+    """
+    raw = repr((request.user.pk, request.get_full_path(), versions))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def latest(queryset, keys=('pub_date', 'pk')):
+    """Ключ самой новой записи; запрос идёт по индексу ленты."""
+    return queryset.order_by(*(f'-{key}' for key in keys)).values_list(
+        *keys).first()
+
+
+def last_updated(posts):
+    """Последняя правка постов выборки по индексу на updated."""
+    return posts.order_by().aggregate(updated=Max('updated'))['updated']
+
+
+def page_versions(request, posts, keys=('pub_date', 'pk')):
+    """Версии постов той страницы, которую выберет курсор запроса.
+
+    Ловит и то, что не сдвигает ключи ленты: правку, удаление поста
+    со страницы, переименование его группы.
+    """
+    page = KeysetPaginator(
+        posts.select_related('group').only(
+            'pub_date', 'updated', 'comment_count',
+            'group__slug', 'group__title'),
+        settings.POST_NUMBER_ON_PAGE,
+        keys,
+    ).get_page(request.GET.get('cursor'))
+    return page.has_previous(), page.has_next(), [
+        (post.pk, post.updated, post.comment_count,
+         post.group and (post.group.slug, post.group.title))
+        for post in page
+    ]
+
+
+def feed_versions(request, posts):
+    return (
+        latest(posts), last_updated(posts), page_versions(request, posts))
+
+
+def recommendations_version(request):
+    return [author.pk for author in viewer_recommendations(request)]
+
+
+def index_etag(request):
+    return page_etag(request, feed_versions(request, Post.objects.all()))
+
+
+def group_etag(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'title', 'description', 'posts_count').first()
+    if group is None:
+        return None
+    return page_etag(request, group, feed_versions(
+        request, Post.objects.filter(group_id=group[0])))
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'first_name', 'last_name', 'counter__posts_count',
+        'counter__follows_count', 'counter__followers_count').first()
+    if author is None:
+        return None
+    return page_etag(
+        request, author, is_following(request, author[0]),
+        recommendations_version(request),
+        feed_versions(request, Post.objects.filter(author_id=author[0])))
+
+
+def post_detail_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'pk', 'updated', 'comment_count', 'group__slug', 'group__title',
+        'author__counter__posts_count').first()
+    if post is None:
+        return None
+    return page_etag(
+        request, post, latest(Comment.objects.filter(post_id=post_id)))
+
+
+def follow_etag(request):
+    return page_etag(
+        request,
+        latest(TimelineEntry.objects.filter(user=request.user),
+               ('pub_date', 'post_id')),
+        recommendations_version(request),
+        page_versions(request, follow_feed(request.user), FEED_KEYS),
+    )
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.cache import bump_generation
+from core.utils import chunked
+from . import counters, timeline
+from .models import Follow
+
+
+def _insert(user_id, author_ids):
+    ops = connection.ops
+    values = ', '.join(['(%s, %s)'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{Follow._meta.db_table} (user_id, author_id) VALUES {values}'
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [value for author_id in author_ids
+             for value in (user_id, author_id)],
+        )
+        return cursor.rowcount
+
+
+def _delete(user_id, author_ids):
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Follow._meta.db_table} '
+            f'WHERE user_id = %s AND author_id IN ({placeholders})',
+            [user_id, *author_ids],
+        )
+        return cursor.rowcount
+
+
+def _changed(user_id, author_ids, delta):
+    # То же, что сигналы Follow делают для одной подписки, но
+    # запросами на весь пакет. Число подписчиков пересчитывается,
+    # потому что rowcount не говорит, какие именно строки изменились.
+    counters.bump_user(user_id, 'follows_count', delta)
+    counters.recount_followers(author_ids)
+    if delta > 0:
+        timeline.backfill(user_id, author_ids)
+    else:
+        timeline.prune(user_id, author_ids)
+    key = f'follows:{user_id}'
+    transaction.on_commit(lambda: bump_generation(key))
+
+
+def _apply(write, user, authors, sign):
+    author_ids = sorted({author.pk for author in authors} - {user.pk})
+    changed = 0
+    with transaction.atomic():
+        for batch in chunked(author_ids, settings.FOLLOW_BATCH_SIZE):
+            count = write(user.pk, batch)
+            if count:
+                _changed(user.pk, batch, sign * count)
+            changed += count
+    return changed
+
+
+def follow_many(user, authors):
+    """Подписывает пользователя на авторов и возвращает число новых подписок.
+
+    Подписки вставляются пакетами по FOLLOW_BATCH_SIZE запросом
+    INSERT, пропускающим уже существующие пары, поэтому повторные
+    и одновременные подписки не приводят к IntegrityError. Все пакеты
+    записываются в одной транзакции; на себя подписаться нельзя.
+    """
+    return _apply(_insert, user, authors, 1)
+
+
+def unfollow_many(user, authors):
+    """Отписывает пользователя от авторов и возвращает число отписок."""
+    return _apply(_delete, user, authors, -1)
+
+
+def follow(user, author):
+    return bool(follow_many(user, [author]))
+
+
+def unfollow(user, author):
+    return bool(unfollow_many(user, [author]))
+
+
+def is_following(request, author_id):
+    """Подписан ли зритель на автора; проверка одна на весь запрос."""
+    checked = request.__dict__.setdefault('_following', {})
+    if author_id not in checked:
+        user = request.user
+        checked[author_id] = (
+            user.is_authenticated and user.pk != author_id
+            and Follow.objects.filter(user=user, author_id=author_id).exists())
+    return checked[author_id]
@@ -0,0 +1,147 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, StoredImage
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Из метаданных сохраняется только то, без чего картинка изменится.
+KEPT_INFO = ('transparency',)
+
+
+def _decode(upload):
+    upload.seek(0)
+    with Image.open(upload) as source:
+        width, height = source.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Картинка больше %(limit)d мегапикселей.',
+                code='too_many_pixels',
+                params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6})
+        image_format = source.format if source.format in EXTENSIONS else 'JPEG'
+        side = settings.POST_IMAGE_MAX_SIDE
+        # thumbnail сам запросил бы draft удвоенного размера, и крупный
+        # JPEG декодировался бы почти без уменьшения.
+        source.draft(None, (side, side))
+        source.thumbnail((side, side))
+        return ImageOps.exif_transpose(source), image_format
+
+
+def ingest(upload):
+    """Проверяет загруженную картинку и сохраняет её уменьшенную копию.
+
+    Размер файла и число пикселей проверяются до декодирования: Pillow
+    читает из потока загрузки только заголовок. JPEG декодируется
+    сразу в уменьшенном масштабе (draft), остальные форматы
+    уменьшаются через reduce, поэтому в памяти держится растр не больше
+    POST_IMAGE_MAX_PIXELS. EXIF, ICC-профиль и прочие метаданные
+    отбрасываются, а ориентация из EXIF применяется к пикселям.
+    Нечитаемый файл даёт ошибку проверки, а не исключение Pillow.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.', code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20})
+    try:
+        image, image_format = _decode(upload)
+    except (OSError, Image.DecompressionBombError):
+        # Обрезанный или испорченный файл падает только при декодировании.
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image')
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEPT_INFO
+    }
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.POST_IMAGE_QUALITY)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(
+        buffer.getvalue(), name=f'{stem}.{EXTENSIONS[image_format]}')
+
+
+IMAGE_METADATA_FIELDS = (
+    'image_width', 'image_height', 'image_format', 'image_size')
+
+
+def image_metadata(image):
+    """Ширина, высота, формат и размер файла картинки.
+
+    Pillow читает только заголовок: у новой загрузки — из её потока
+    в памяти, у сохранённой картинки — из хранилища. Для картинки,
+    которую не удалось прочитать, значения пустые.
+    """
+    empty = dict(zip(IMAGE_METADATA_FIELDS, (None, None, '', None)))
+    if not image:
+        return empty
+    try:
+        image.open('rb')
+        try:
+            with Image.open(image) as source:
+                width, height = source.size
+                image_format = source.format or ''
+            size = image.size
+        finally:
+            if image._committed:
+                image.close()
+            else:
+                image.seek(0)
+    except (OSError, SuspiciousFileOperation, ValueError):
+        return empty
+    return dict(zip(
+        IMAGE_METADATA_FIELDS, (width, height, image_format, size)))
+
+
+def is_stored(image):
+    """Файл картинки лежит в её хранилище."""
+    if not image:
+        return False
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def retain(name):
+    """Учитывает ещё одну ссылку поста на файл картинки."""
+    images = StoredImage.objects.filter(name=name)
+    if images.update(references=F('references') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(name=name, references=1)
+    except IntegrityError:
+        images.update(references=F('references') + 1)
+
+
+def release(name):
+    """Снимает ссылку на файл; последняя ссылка удаляет файл.
+
+    Файл и его миниатюры удаляются только после фиксации транзакции,
+    чтобы откат не оставил посты без картинок.
+    """
+    images = StoredImage.objects.filter(name=name)
+    deleted, _ = images.filter(references__lte=1).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_unreferenced(name))
+    else:
+        images.filter(references__gt=1).update(
+            references=F('references') - 1)
+
+
+def delete_unreferenced(name):
+    """Удаляет файл и миниатюры, если на файл снова никто не сослался."""
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    image_file = ImageFile(name, Post._meta.get_field('image').storage)
+    default.kvstore.delete(image_file)
+    if is_stored(image_file):
+        image_file.delete()
@@ -0,0 +1,62 @@
+import copy
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+from posts.templatetags.post_fragments import FEED_THUMBNAIL, POST_TEMPLATE
+from posts.views import feed_queryset
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время отрисовки страницы ленты без картинок, '
+            'с отдельными и с пакетными запросами миниатюр.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кеш миниатюр перед каждым замером.')
+
+    def handle(self, *args, requests, warm, **options):
+        posts = list(feed_queryset(Post.objects.filter(
+            thumbnails_ready=True)).order_by('-pub_date', '-pk')[
+                :settings.POST_NUMBER_ON_PAGE])
+        if not posts:
+            raise CommandError(
+                'Нет постов с готовыми миниатюрами: '
+                'загрузите картинки и выполните generate_thumbnails.')
+        modes = {
+            'без картинок': self.without_images,
+            'по одной': lambda page: None,
+            'пакетом': lambda page: thumbnails.prefetch(page, FEED_THUMBNAIL),
+        }
+        for name, prepare in modes.items():
+            timings, queries = [], []
+            for _ in range(requests):
+                page = [copy.copy(post) for post in posts]
+                if not warm:
+                    default.kvstore.cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    prepare(page)
+                    for post in page:
+                        render_to_string(POST_TEMPLATE, {'post': post})
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries.append(len(context))
+            self.stdout.write(
+                f'{name:14} p50={statistics.median(timings):8.2f}ms '
+                f'mean={statistics.mean(timings):8.2f}ms '
+                f'queries={max(queries):3}')
+
+    @staticmethod
+    def without_images(page):
+        for post in page:
+            post.image = ''
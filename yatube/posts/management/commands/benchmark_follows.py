@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import follows
+from posts.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость подписки на много авторов по одной '
+            'за клик и пакетом. Все изменения откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=500)
+
+    def handle(self, *args, authors, **options):
+        modes = {
+            'по одной': self.one_by_one,
+            'пакетом': self.in_bulk,
+        }
+        for name, run in modes.items():
+            try:
+                with transaction.atomic():
+                    reader = User.objects.create_user(
+                        username='benchmark_reader')
+                    User.objects.bulk_create(
+                        User(username=f'benchmark_author_{i}')
+                        for i in range(authors))
+                    targets = list(User.objects.filter(
+                        username__startswith='benchmark_author_'))
+                    queries = []
+                    with connection.execute_wrapper(
+                            lambda execute, sql, *args: queries.append(sql)
+                            or execute(sql, *args)):
+                        start = time.perf_counter()
+                        run(reader, targets)
+                        elapsed = time.perf_counter() - start
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f'{name:10} {len(targets) / elapsed:10.0f} подписок/с '
+                f'queries={len(queries):5}')
+
+    @staticmethod
+    def one_by_one(reader, targets):
+        # Так подписывает кнопка на странице профиля.
+        for author in targets:
+            follows.follow(reader, author)
+
+    @staticmethod
+    def in_bulk(reader, targets):
+        follows.follow_many(reader, targets)
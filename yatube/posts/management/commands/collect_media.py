@@ -0,0 +1,139 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.utils import BloomFilter, chunked
+from posts.models import Post, StoredImage
+from posts.thumbnails import renditions, thumbnail_file
+
+
+def scan(root, path=''):
+    """Файлы каталога root рекурсивно: (имя от MEDIA_ROOT, stat).
+
+    Каталоги читаются по одному через scandir, поэтому список файлов
+    никогда не держится в памяти целиком.
+    """
+    try:
+        entries = os.scandir(os.path.join(root, path))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = os.path.join(path, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat(follow_symlinks=False)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов и миниатюры, на которые '
+            'не ссылается ни один пост.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их пост '
+                 'может быть ещё не сохранён.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не удаляя.')
+
+    def handle(self, *args, batch_size, min_age, dry_run, **options):
+        self.dry_run = dry_run
+        self.image_storage = Post._meta.get_field('image').storage
+        referenced = self.mark()
+        deadline = time.time() - min_age
+        deleted = reclaimed = 0
+        folders = (
+            settings.POST_IMAGE_FOLDER_NAME,
+            thumbnail_settings.THUMBNAIL_PREFIX,
+        )
+        for folder in folders:
+            orphans = (
+                (name, file_stat.st_size)
+                for name, file_stat in scan(settings.MEDIA_ROOT, folder)
+                if file_stat.st_mtime < deadline and name not in referenced
+            )
+            for batch in chunked(orphans, batch_size):
+                batch = self.sweep(folder, batch, deadline)
+                deleted += len(batch)
+                reclaimed += sum(size for _, size in batch)
+        action = 'Можно удалить' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {deleted}, '
+            f'освобождено байт: {reclaimed}.'))
+
+    def mark(self):
+        """Имена картинок постов и всех их миниатюр.
+
+        Имена читаются потоком и складываются в фильтр Блума: ошибается
+        он только в сторону «нужен», поэтому лишний файл в худшем
+        случае переживёт очередную сборку.
+        """
+        images = Post.objects.exclude(image='').exclude(
+            image__isnull=True).order_by().values_list('image', flat=True)
+        sizes = [list(renditions(size)) for size in settings.POST_THUMBNAILS]
+        per_image = 1 + sum(len(size) for size in sizes)
+        referenced = BloomFilter(images.count() * per_image)
+        for name in images.iterator():
+            referenced.add(name)
+            image = ImageFile(name, self.image_storage)
+            for size in sizes:
+                for _, _, geometry, options in size:
+                    referenced.add(thumbnail_file(
+                        image, geometry, options).name)
+        return referenced
+
+    def is_stale(self, name, deadline):
+        try:
+            return os.stat(
+                os.path.join(settings.MEDIA_ROOT, name)).st_mtime < deadline
+        except FileNotFoundError:
+            return False
+
+    def sweep(self, folder, batch, deadline):
+        """Удаляет пачку файлов вместе с их записями в KV-хранилище.
+
+        Перед удалением пачка проверяется заново: пока шёл обход, на
+        файл мог сослаться новый пост, а повторная загрузка того же
+        содержимого обновляет mtime файла. Возвращает удаляемые файлы.
+        """
+        originals = folder == settings.POST_IMAGE_FOLDER_NAME
+        batch = [
+            (name, size) for name, size in batch
+            if self.is_stale(name, deadline)
+        ]
+        if originals and batch:
+            live = set(Post.objects.filter(
+                image__in=[name for name, _ in batch]
+            ).values_list('image', flat=True))
+            batch = [(name, size) for name, size in batch if name not in live]
+        if self.dry_run or not batch:
+            return batch
+        names = [name for name, _ in batch]
+        storage = self.image_storage if originals else default.storage
+        keys = []
+        for name in names:
+            key = ImageFile(name, storage).key
+            keys.append(add_prefix(key))
+            if originals:
+                keys.append(add_prefix(key, 'thumbnails'))
+        KVStore.objects.filter(key__in=keys).delete()
+        default.kvstore.cache.delete_many(keys)
+        if originals:
+            StoredImage.objects.filter(name__in=names).delete()
+        for name in names:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, name))
+            except FileNotFoundError:
+                pass
+        return batch
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import chunked
+from posts.images import IMAGE_METADATA_FIELDS, image_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Сохраняет в постах ширину, высоту, формат и размер '
+            'картинок, загруженных до появления этих полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перечитать и уже заполненные картинки.')
+
+    def handle(self, *args, batch_size, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(image_size__isnull=True)
+        post_ids = posts.order_by('pk').values_list('pk', flat=True)
+        done = unreadable = 0
+        for batch in chunked(post_ids.iterator(), batch_size):
+            batch_posts = list(Post.objects.filter(pk__in=batch).only(
+                'image', *IMAGE_METADATA_FIELDS))
+            for post in batch_posts:
+                metadata = image_metadata(post.image)
+                unreadable += metadata['image_size'] is None
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+            Post.objects.bulk_update(batch_posts, IMAGE_METADATA_FIELDS)
+            done += len(batch_posts)
+            self.stdout.write(f'Обработано постов: {done}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Не удалось прочитать картинок: {unreadable}.'))
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.utils import chunked
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def generate_closing(post_id):
+    try:
+        generate(post_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для постов, у которых они ещё не готовы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.BACKGROUND_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры и для готовых постов.')
+
+    def handle(self, *args, workers, batch_size, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnails_ready=False)
+        post_ids = posts.order_by('pk').values_list('pk', flat=True)
+        done = 0
+        if workers > 1:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            run = executor.map
+        else:
+            # Один поток работает в текущем соединении без пула.
+            executor, run = None, map
+        try:
+            for batch in chunked(post_ids.iterator(), batch_size):
+                list(run(generate_closing if executor else generate, batch))
+                done += len(batch)
+                self.stdout.write(f'Обработано постов: {done}')
+        finally:
+            if executor:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS('Готово.'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.utils import chunked
+from posts import moderation
+
+DELETE_FUNCTIONS = {
+    'users': moderation.delete_users,
+    'posts': moderation.delete_post_ids,
+}
+
+
+class Command(BaseCommand):
+    help = ('Удаляет пользователей или посты со всеми связанными '
+            'строками пачками. Повторный запуск доделывает прерванное '
+            'удаление, в том числе начатое из админки в фоне.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(DELETE_FUNCTIONS))
+        parser.add_argument('ids', nargs='+', type=int)
+
+    def handle(self, *args, model, ids, **options):
+        delete = DELETE_FUNCTIONS[model]
+        for batch in chunked(ids, settings.MODERATION_BATCH_SIZE):
+            delete(batch)
+        self.stdout.write(f'Удалено объектов: {len(ids)}.')
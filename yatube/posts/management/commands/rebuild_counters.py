@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts.counters import (
+    TOTAL_POSTS_KEY, USER_COUNTERS, count_subquery, recount_comments,
+    recount_groups,
+)
+from posts.models import Post, User, UserCounter
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев, групп и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк обрабатывать за один проход.')
+
+    def handle(self, *args, batch_size, **options):
+        posts = self.rebuild_posts(batch_size)
+        recount_groups()
+        cache.delete(TOTAL_POSTS_KEY)
+        drifted = self.rebuild_users(batch_size)
+        self.stdout.write(
+            f'Постов пересчитано: {posts}. '
+            f'Расхождений в счётчиках пользователей: {drifted}.')
+
+    def rebuild_posts(self, batch_size):
+        total = 0
+        last_pk = 0
+        while True:
+            pks = list(Post.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            total += recount_comments(
+                Post.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]))
+            last_pk = pks[-1]
+
+    def rebuild_users(self, batch_size):
+        drifted = 0
+        last_pk = 0
+        while True:
+            rows = list(User.objects.filter(pk__gt=last_pk).order_by(
+                'pk').annotate(**{
+                    name: count_subquery(model, field)
+                    for name, (model, field) in USER_COUNTERS.items()
+                }).values('pk', *USER_COUNTERS)[:batch_size])
+            if not rows:
+                return drifted
+            stored = UserCounter.objects.in_bulk([row['pk'] for row in rows])
+            missing, changed = [], []
+            for row in rows:
+                last_pk = row.pop('pk')
+                fresh = UserCounter(user_id=last_pk, **row)
+                counter = stored.get(fresh.user_id)
+                if counter is None:
+                    missing.append(fresh)
+                elif any(getattr(counter, name) != value
+                         for name, value in row.items()):
+                    changed.append(fresh)
+            UserCounter.objects.bulk_create(missing, ignore_conflicts=True)
+            UserCounter.objects.bulk_update(changed, list(USER_COUNTERS))
+            drifted += len(missing) + len(changed)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Пересоздаёт полнотекстовый индекс постов и его триггеры. '
+            'Нужен после миграций, пересобирающих таблицу постов.')
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild()
+        self.stdout.write(f'Проиндексировано постов: {indexed}.')
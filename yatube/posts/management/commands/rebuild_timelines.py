@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Добавляет в ленты подписок недостающие посты. '
+            'Нужен после сбоя фоновой раздачи постов.')
+
+    def handle(self, *args, **options):
+        added = timeline.rebuild()
+        self.stdout.write(f'Добавлено записей в ленты: {added}.')
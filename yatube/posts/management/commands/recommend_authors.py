@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации авторов по таблице подписок. '
+            'Запускается периодически, например из cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=None,
+            help='Сколько авторов рекомендовать каждому читателю.')
+
+    def handle(self, *args, size, **options):
+        start = time.perf_counter()
+        users = recommendations.rebuild(size)
+        self.stdout.write(
+            f'Рекомендации посчитаны для {users} читателей '
+            f'за {time.perf_counter() - start:.2f} с.')
@@ -0,0 +1,142 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from faker import Faker
+
+from core.utils import chunked
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями и постами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок одного пользователя.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            weights = self.popularity(len(users), options['alpha'])
+            posts = self.create_posts(
+                options['posts'], users, weights, groups)
+            self.create_comments(options['comments'], users, posts)
+            follows = self.create_follows(
+                users, weights, options['follows_per_user'])
+        timeline.rebuild()
+        call_command('rebuild_counters', stdout=self.stdout)
+        self.stdout.write(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {len(posts)}, подписок {follows}.')
+
+    def popularity(self, size, alpha):
+        """Веса авторов по степенному закону от случайного ранга."""
+        ranks = list(range(1, size + 1))
+        self.random.shuffle(ranks)
+        return [rank ** -alpha for rank in ranks]
+
+    def sentences(self, size=500):
+        if not hasattr(self, '_sentences'):
+            self._sentences = [self.faker.sentence() for _ in range(size)]
+        return self._sentences
+
+    def text(self, sentences=3):
+        return ' '.join(self.random.choices(self.sentences(), k=sentences))
+
+    def insert(self, model, objects):
+        for batch in chunked(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+
+    def new_ids(self, model, first_pk):
+        return list(model.objects.filter(pk__gt=first_pk).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_users(self, number):
+        first_pk = self.last_pk(User)
+        password = make_password(None)
+        self.insert(User, (
+            User(
+                username=f'seed_{first_pk}_{i}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            ) for i in range(number)
+        ))
+        return self.new_ids(User, first_pk)
+
+    def create_groups(self, number):
+        first_pk = self.last_pk(Group)
+        self.insert(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'seed-{first_pk}-{i}',
+                description=self.text(),
+            ) for i in range(number)
+        ))
+        return self.new_ids(Group, first_pk)
+
+    def create_posts(self, number, users, weights, groups):
+        first_pk = self.last_pk(Post)
+        authors = self.random.choices(users, weights, k=number)
+        self.insert(Post, (
+            Post(
+                author_id=author,
+                group_id=self.random.choice(groups + [None]),
+                text=self.text(self.random.randint(1, 8)),
+            ) for author in authors
+        ))
+        return self.new_ids(Post, first_pk)
+
+    def create_comments(self, number, users, posts):
+        if not posts:
+            return
+        self.insert(Comment, (
+            Comment(
+                post_id=self.random.choice(posts),
+                author_id=self.random.choice(users),
+                text=self.text(1),
+            ) for _ in range(number)
+        ))
+
+    def create_follows(self, users, weights, per_user):
+        first_pk = self.last_pk(Follow)
+        self.insert(Follow, self.follows(users, weights, per_user))
+        return Follow.objects.filter(pk__gt=first_pk).count()
+
+    def follows(self, users, weights, per_user):
+        # Накопленные веса считаются один раз, а не в каждом вызове choices.
+        cum_weights = list(accumulate(weights))
+        for user in users:
+            wanted = min(
+                int(self.random.expovariate(1 / per_user)) if per_user else 0,
+                len(users) - 1,
+            )
+            authors = set(self.random.choices(
+                users, cum_weights=cum_weights, k=wanted))
+            authors.discard(user)
+            for author in authors:
+                yield Follow(user_id=user, author_id=author)
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:27
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_stored_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    StoredImage.objects.bulk_create(
+        StoredImage(name=row['image'], references=row['total'])
+        for row in Post.objects.exclude(image='').exclude(
+            image__isnull=True).order_by().values('image').annotate(
+                total=Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_post_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='имя файла')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='число ссылок')),
+            ],
+            options={
+                'verbose_name': 'файл картинки',
+                'verbose_name_plural': 'файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите картинку', null=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='картинка'),
+        ),
+        migrations.RunPython(fill_stored_images, migrations.RunPython.noop),
+    ]
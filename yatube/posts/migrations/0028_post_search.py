@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from posts import search
+    search.rebuild(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from posts import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
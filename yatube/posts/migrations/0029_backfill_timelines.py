@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Ленты подписок, оформленных до появления TimelineEntry.
+    from posts import timeline
+    timeline.rebuild(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:21
+
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    from posts import search
+    search.drop_triggers(schema_editor.connection)
+
+
+def restore_search(apps, schema_editor):
+    from posts import search
+    search.restore(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_backfill_timelines'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, restore_search),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated'], name='post_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'updated'], name='post_author_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'updated'], name='post_group_updated_idx'),
+        ),
+        migrations.RunPython(restore_search, drop_search_triggers),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.conf import settings
 
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -22,6 +23,11 @@ class Group(models.Model):
         'описание',
         help_text='краткое описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        'число постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -54,15 +60,79 @@ class Post(CreatedModel):
     image = models.ImageField(
         'картинка',
         upload_to=settings.POST_IMAGE_FOLDER_NAME,
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         help_text='Загрузите картинку'
     )
+    image_width = models.PositiveIntegerField(
+        'ширина картинки',
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'высота картинки',
+        null=True,
+        editable=False,
+    )
+    image_format = models.CharField(
+        'формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'размер файла картинки',
+        null=True,
+        editable=False,
+    )
+    thumbnails_ready = models.BooleanField(
+        'миниатюры готовы',
+        default=False,
+        editable=False,
+    )
+    comment_count = models.PositiveIntegerField(
+        'число комментариев',
+        default=0,
+        editable=False,
+    )
+    # Сдвигается при любой записи, меняющей вывод поста, в том числе
+    # через update(); по нему сверяются ETag страниц.
+    updated = models.DateTimeField(
+        'дата изменения',
+        auto_now=True,
+    )
 
     def __str__(self) -> str:
         return self.text[0:15]
 
     class Meta(CreatedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['updated'],
+                name='post_updated_idx',
+            ),
+            models.Index(
+                fields=['author', 'updated'],
+                name='post_author_updated_idx',
+            ),
+            models.Index(
+                fields=['group', 'updated'],
+                name='post_group_updated_idx',
+            ),
+        ]
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
@@ -89,6 +159,12 @@ class Comment(CreatedModel):
         return self.text[0:15]
 
     class Meta(CreatedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_pub_date_idx',
+            ),
+        ]
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
 
@@ -118,5 +194,100 @@ class Follow(models.Model):
                 name='no_self_follow',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+
+
+class UserCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counter',
+        verbose_name='пользователь',
+    )
+    posts_count = models.PositiveIntegerField('число постов', default=0)
+    follows_count = models.PositiveIntegerField('число подписок', default=0)
+    followers_count = models.PositiveIntegerField(
+        'число подписчиков', default=0)
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+
+class StoredImage(models.Model):
+    name = models.CharField('имя файла', max_length=100, primary_key=True)
+    references = models.PositiveIntegerField('число ссылок', default=0)
+
+    def __str__(self) -> str:
+        return self.name
+
+    class Meta:
+        verbose_name = 'файл картинки'
+        verbose_name_plural = 'файлы картинок'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост',
+    )
+    pub_date = models.DateTimeField('дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='читатель',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+        verbose_name='рекомендуемый автор',
+    )
+    position = models.PositiveSmallIntegerField('место в списке')
+    score = models.PositiveIntegerField('оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'position'],
+                name='unique_recommendation_position',
+            ),
+        ]
+        verbose_name = 'рекомендация'
+        verbose_name_plural = 'рекомендации'
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core.cache import bump_generation
+from . import counters, images
+from .models import (Comment, Follow, Group, Post, Recommendation,
+                     TimelineEntry, User)
+from .recommendations import RECOMMENDATIONS_GENERATION
+
+
+def _raw_delete(model, column, values):
+    # DELETE без сборщика каскадов Django: зависимые строки к этому
+    # моменту уже удалены.
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table} '
+            f'WHERE {column} IN ({placeholders})',
+            values,
+        )
+
+
+def _rows(queryset, fields):
+    return list(queryset.order_by('pk').values_list('pk', *fields)[
+        :settings.MODERATION_BATCH_SIZE])
+
+
+def purge(queryset, *fields, after=None):
+    """Удаляет строки выборки пачками, каждую в своей транзакции.
+
+    Пачка из MODERATION_BATCH_SIZE строк читается по первичному ключу
+    вместе с fields и передаётся в after(rows) внутри той же
+    транзакции, чтобы пересчитать зависящие от неё данные.
+    Возвращает число удалённых строк.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = _rows(queryset, fields)
+            if not rows:
+                return deleted
+            _raw_delete(model, model._meta.pk.column, [row[0] for row in rows])
+            if after is not None:
+                after(rows)
+        deleted += len(rows)
+
+
+def _comments_deleted(rows):
+    counters.recount_comments(
+        Post.objects.filter(pk__in={post_id for _, post_id in rows}))
+    transaction.on_commit(lambda: bump_generation('posts'))
+
+
+def _follows_deleted(rows):
+    users = {user_id for _, user_id, _ in rows}
+    counters.recount_follows(users)
+    counters.recount_followers({author_id for _, _, author_id in rows})
+    transaction.on_commit(lambda: bump_generation(
+        *(f'follows:{user_id}' for user_id in users)))
+
+
+def _posts_deleted(rows):
+    counters.recount_posts({author_id for _, author_id, _, _ in rows})
+    counters.recount_groups(Group.objects.filter(
+        pk__in={group_id for _, _, group_id, _ in rows if group_id}))
+    for _, _, _, image in rows:
+        if image:
+            images.release(image)
+    transaction.on_commit(_posts_cleanup)
+
+
+def _posts_cleanup():
+    cache.delete(counters.TOTAL_POSTS_KEY)
+    bump_generation('posts')
+
+
+def delete_posts(posts):
+    """Удаляет посты с комментариями и записями лент без сборщика Django.
+
+    Сборщик каскадов читает в память все связанные строки до удаления.
+    Здесь посты берутся пачками по MODERATION_BATCH_SIZE; зависимые
+    строки пачки удаляются своими короткими транзакциями, а сами посты
+    — одной, вместе с пересчётом счётчиков и ссылок на картинки.
+    Кеши сбрасываются после фиксации. Возвращает число удалённых постов.
+    """
+    fields = ('author_id', 'group_id', 'image')
+    deleted = 0
+    while True:
+        rows = _rows(posts, fields)
+        if not rows:
+            return deleted
+        pks = [row[0] for row in rows]
+        purge(Comment.objects.filter(post_id__in=pks))
+        purge(TimelineEntry.objects.filter(post_id__in=pks))
+        with transaction.atomic():
+            # Комментарии и записи лент, появившиеся за время чистки.
+            _raw_delete(Comment, 'post_id', pks)
+            _raw_delete(TimelineEntry, 'post_id', pks)
+            _raw_delete(Post, Post._meta.pk.column, pks)
+            _posts_deleted(rows)
+        deleted += len(rows)
+
+
+def delete_post_ids(post_ids):
+    return delete_posts(Post.objects.filter(pk__in=post_ids))
+
+
+def delete_user(user_id):
+    """Удаляет пользователя со всеми его постами, комментариями и подписками.
+
+    Когда связанных строк не остаётся, сам пользователь удаляется
+    обычным delete(): сборщику остаются только его счётчики и служебные
+    записи Django.
+    """
+    delete_posts(Post.objects.filter(author_id=user_id))
+    purge(Comment.objects.filter(author_id=user_id), 'post_id',
+          after=_comments_deleted)
+    for follows in (Follow.objects.filter(user_id=user_id),
+                    Follow.objects.filter(author_id=user_id)):
+        purge(follows, 'user_id', 'author_id', after=_follows_deleted)
+    purge(TimelineEntry.objects.filter(user_id=user_id))
+    purge(Recommendation.objects.filter(user_id=user_id))
+    purge(Recommendation.objects.filter(author_id=user_id))
+    User.objects.filter(pk=user_id).delete()
+    bump_generation(RECOMMENDATIONS_GENERATION)
+
+
+def delete_users(user_ids):
+    for user_id in user_ids:
+        delete_user(user_id)
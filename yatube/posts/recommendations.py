@@ -0,0 +1,225 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from core.cache import bump_generation
+from core.utils import chunked
+from .models import Follow, Recommendation
+
+RECOMMENDATIONS_GENERATION = 'recommendations'
+
+
+class FollowMatrix:
+    """Таблица подписок в виде разреженной матрицы смежности CSR.
+
+    Пользователи пронумерованы подряд; подписки i-го пользователя —
+    отсортированный срез following[following_ptr[i]:following_ptr[i + 1]],
+    подписчики — такой же срез followers. sampled_followers хранит те
+    же строки подписчиков в случайном порядке, так что первые N ячеек
+    строки — случайная выборка. Все данные лежат в массивах NumPy,
+    поэтому ребро занимает по 8 байт в каждой из трёх таблиц, а строки
+    матрицы перемножаются без цикла Python по элементам.
+    """
+
+    def __init__(self, pairs, seed=None):
+        edges = np.fromiter(
+            chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+        self.ids, index = np.unique(edges, return_inverse=True)
+        index = index.reshape(-1, 2)
+        users, authors = index[:, 0], index[:, 1]
+        self.following_ptr, self.following = self.compress(users, authors)
+        self.followers_ptr, self.followers = self.compress(authors, users)
+        shuffle = np.random.default_rng(seed).random(len(users))
+        self.sampled_followers = users[np.lexsort((shuffle, authors))]
+
+    @classmethod
+    def load(cls, seed=None):
+        return cls(Follow.objects.order_by().values_list(
+            'user_id', 'author_id').iterator(), seed)
+
+    def compress(self, rows, columns):
+        ptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.ids)), out=ptr[1:])
+        return ptr, columns[np.lexsort((columns, rows))]
+
+    @staticmethod
+    def gather(ptr, cells, rows, limit=None):
+        """Склеенные строки rows матрицы и длины этих строк.
+
+        Если задан limit, от каждой строки берутся первые limit ячеек.
+        """
+        starts = ptr[rows]
+        lengths = ptr[rows + 1] - starts
+        if limit is not None:
+            lengths = np.minimum(lengths, limit)
+        ends = np.cumsum(lengths)
+        offsets = np.repeat(starts - ends + lengths, lengths)
+        offsets += np.arange(len(offsets))
+        return cells[offsets], lengths
+
+    def scores(self, readers):
+        """Оценки авторов для пачки читателей readers (номеров строк).
+
+        Каждый автор, на которого подписаны авторы читателя (друзья
+        друзей), получает RECOMMENDATION_FOF_WEIGHT баллов, а каждый
+        автор, на которого подписаны другие подписчики тех же авторов
+        (совместные подписки), — по баллу за каждого общего автора;
+        у каждого автора учитываются RECOMMENDATION_COFOLLOW_SAMPLE
+        случайных подписчиков. Вся пачка считается одним набором
+        вызовов NumPy: строки собираются срезами, пары (читатель,
+        автор) кодируются одним числом, и баллы складываются одной
+        сортировкой этих чисел.
+
+        Возвращает номера читателей в пачке, авторов и их оценки,
+        упорядоченные по читателю и автору; авторы, на которых
+        читатель уже подписан, и он сам отброшены.
+        """
+        width = len(self.ids)
+        ptr, cells = self.following_ptr, self.following
+        following, counts = self.gather(ptr, cells, readers)
+        owners = np.repeat(np.arange(len(readers)), counts)
+        sampled, sample_counts = self.gather(
+            self.followers_ptr, self.sampled_followers, following,
+            settings.RECOMMENDATION_COFOLLOW_SAMPLE)
+        pairs, shared = np.unique(
+            np.repeat(owners, sample_counts) * width + sampled,
+            return_counts=True)
+        pair_owners, co_followers = np.divmod(pairs, width)
+        others = co_followers != readers[pair_owners]
+        pair_owners = pair_owners[others]
+        co_followers, shared = co_followers[others], shared[others]
+        co_authors, co_counts = self.gather(ptr, cells, co_followers)
+        friends_of_friends, fof_counts = self.gather(ptr, cells, following)
+        # Пара (читатель, автор) повторяется столько раз, сколько баллов
+        # она приносит, и после сортировки оценка — длина серии.
+        candidates = np.concatenate((
+            np.repeat(
+                np.repeat(pair_owners, co_counts) * width + co_authors,
+                np.repeat(shared, co_counts)),
+            np.repeat(
+                np.repeat(owners, fof_counts) * width + friends_of_friends,
+                settings.RECOMMENDATION_FOF_WEIGHT),
+        ))
+        candidates.sort()
+        starts = np.flatnonzero(np.diff(candidates, prepend=-1))
+        scores = np.diff(starts, append=len(candidates))
+        keys = candidates[starts]
+        known = np.concatenate((
+            owners * width + following,
+            np.arange(len(readers)) * width + readers,
+        ))
+        new = np.isin(keys, known, invert=True)
+        owners, authors = np.divmod(keys[new], width)
+        return owners, authors, scores[new]
+
+    def top(self, readers, size):
+        """Лучшие size авторов каждого читателя пачки.
+
+        Внутри читателя авторы идут по убыванию оценки, затем по id.
+        """
+        owners, authors, scores = self.scores(readers)
+        if not len(scores):
+            return owners, authors, scores
+        # Читатель, обратная оценка и автор в одном числе сортируются
+        # одним вызовом без argsort.
+        width, bound = len(self.ids), int(scores.max()) + 1
+        ranked = np.sort((owners * bound + bound - 1 - scores) * width
+                         + authors)
+        owners, rest = np.divmod(ranked, bound * width)
+        inverted, authors = np.divmod(rest, width)
+        # Место автора в списке читателя — отступ от начала его строк.
+        places = np.arange(len(owners)) - np.searchsorted(owners, owners)
+        best = places < size
+        return owners[best], authors[best], (bound - 1 - inverted)[best]
+
+    def recommendations(self, size):
+        """Пары (id читателя, [(id автора, оценка), ...]) по читателям.
+
+        Читатели идут по возрастанию id и считаются пачками по
+        RECOMMENDATION_SCORE_BLOCK.
+        """
+        readers = np.flatnonzero(np.diff(self.following_ptr))
+        block = settings.RECOMMENDATION_SCORE_BLOCK
+        for start in range(0, len(readers), block):
+            chunk = readers[start:start + block]
+            owners, authors, scores = self.top(chunk, size)
+            bounds = np.searchsorted(
+                owners, np.arange(len(chunk) + 1)).tolist()
+            author_ids = self.ids[authors].tolist()
+            scores = scores.tolist()
+            for k, user_id in enumerate(self.ids[chunk].tolist()):
+                first, last = bounds[k], bounds[k + 1]
+                if first < last:
+                    yield user_id, list(zip(
+                        author_ids[first:last], scores[first:last]))
+
+
+def rebuild(size=None):
+    """Заново считает рекомендации для всех пользователей.
+
+    Списки идут из матрицы потоком, пачками читателей по возрастанию
+    id, и каждая пачка подменяется в одной короткой транзакции: удаляются
+    строки её читателей и читателей между ней и предыдущей пачкой,
+    которым больше нечего рекомендовать, и вставляются новые. Каждый
+    читатель видит либо старый список, либо новый, в памяти держится
+    одна пачка, а запись не держит таблицу всё время пересчёта.
+    Возвращает число пользователей с рекомендациями.
+    """
+    size = size or settings.RECOMMENDATIONS_PER_USER
+    users_per_batch = max(1, settings.RECOMMENDATION_BATCH_SIZE // size)
+    previous, count = None, 0
+    for batch in chunked(
+            FollowMatrix.load().recommendations(size), users_per_batch):
+        last = batch[-1][0]
+        replaced = Recommendation.objects.filter(user_id__lte=last)
+        if previous is not None:
+            replaced = replaced.filter(user_id__gt=previous)
+        with transaction.atomic():
+            replaced.delete()
+            Recommendation.objects.bulk_create(
+                Recommendation(
+                    user_id=user_id, author_id=author_id,
+                    position=position, score=score,
+                )
+                for user_id, top in batch
+                for position, (author_id, score) in enumerate(top)
+            )
+        previous, count = last, count + len(batch)
+    # Читатели после последней пачки, которым больше нечего рекомендовать.
+    stale = Recommendation.objects.all()
+    if previous is not None:
+        stale = stale.filter(user_id__gt=previous)
+    stale.delete()
+    bump_generation(RECOMMENDATIONS_GENERATION)
+    return count
+
+
+def recommended_authors(user):
+    """Готовые рекомендации читателя одним запросом.
+
+    Авторы, на которых читатель подписался после пересчёта,
+    отбрасываются подзапросом по уникальному индексу подписок.
+    """
+    if not user.is_authenticated:
+        return []
+    return [
+        recommendation.author for recommendation in
+        Recommendation.objects.filter(user=user).annotate(
+            followed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        ).filter(followed=False).select_related(
+            'author').order_by('position')
+    ]
+
+
+def viewer_recommendations(request):
+    """recommended_authors() зрителя, прочитанные один раз за запрос.
+
+    Список сверяет ETag страницы и выводит сама страница.
+    """
+    if not hasattr(request, '_recommended_authors'):
+        request._recommended_authors = recommended_authors(request.user)
+    return request._recommended_authors
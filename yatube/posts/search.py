@@ -0,0 +1,206 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_search'
+
+# Индекс заполняется триггерами, поэтому в него попадают и записи
+# в обход ORM: bulk_create, update() и SET NULL при удалении группы.
+SCHEMA = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    "text, group_title, tokenize = 'unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert '
+    'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {SEARCH_TABLE} (rowid, text, group_title) VALUES ('
+    'new.id, new.text, COALESCE('
+    '(SELECT title FROM posts_group WHERE id = new.group_id), \'\')); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update '
+    'AFTER UPDATE OF text, group_id ON posts_post BEGIN '
+    f'UPDATE {SEARCH_TABLE} SET text = new.text, group_title = COALESCE('
+    '(SELECT title FROM posts_group WHERE id = new.group_id), \'\') '
+    'WHERE rowid = new.id; '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_group '
+    'AFTER UPDATE OF title ON posts_group BEGIN '
+    f'UPDATE {SEARCH_TABLE} SET group_title = new.title WHERE rowid IN ('
+    'SELECT id FROM posts_post WHERE group_id = new.id); '
+    'END',
+]
+
+TRIGGERS = ('insert', 'update', 'delete', 'group')
+
+# Вес совпадений в названии группы относительно текста поста.
+GROUP_TITLE_WEIGHT = 0.5
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт индекс и триггеры, если их ещё нет."""
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def missing_triggers(using=connection):
+    """Триггеры индекса, которых нет в базе; None, если нет и индекса."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name LIKE %s',
+            [f'{SEARCH_TABLE}%'])
+        names = {name for name, in cursor.fetchall()}
+    if SEARCH_TABLE not in names:
+        return None
+    return [trigger for trigger in TRIGGERS
+            if f'{SEARCH_TABLE}_{trigger}' not in names]
+
+
+def restore(using=connection):
+    """Пересоздаёт индекс, если у него нет триггеров.
+
+    Их снимает drop_triggers() перед миграцией постов или групп, а
+    в SQLite старше 3.26 — и сама пересборка таблицы в AddField или
+    AlterField. Записи, сделанные без триггеров, в индекс не попали,
+    поэтому он заполняется заново. Базу, где индекса ещё нет
+    (миграция 0028 не применена), не трогает. Возвращает True, если
+    индекс пришлось пересоздать.
+    """
+    if not is_supported(using) or not missing_triggers(using):
+        return False
+    rebuild(using)
+    return True
+
+
+def drop_triggers(using=connection):
+    """Удаляет триггеры индекса, оставляя сам индекс.
+
+    Триггеры ссылаются на таблицы постов и групп, и SQLite не даёт
+    миграции пересобрать эти таблицы, пока триггеры есть. Миграция,
+    меняющая Post или Group, вызывает drop_triggers() до своих
+    операций и restore() после них.
+    """
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{trigger}')
+
+
+def uninstall(using=connection):
+    if not is_supported(using):
+        return
+    drop_triggers(using)
+    with using.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def rebuild(using=connection):
+    """Заново заполняет индекс по таблице постов.
+
+    Триггеры пересоздаются: SQLite теряет их, когда миграция
+    пересобирает таблицу постов. Возвращает число проиндексированных
+    постов.
+    """
+    uninstall(using)
+    install(using)
+    if not is_supported(using):
+        return 0
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text, group_title) '
+            "SELECT p.id, p.text, COALESCE(g.title, '') FROM posts_post p "
+            'LEFT JOIN posts_group g ON g.id = p.group_id'
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(words):
+    """Выражение MATCH: все слова запроса, каждое как префикс.
+
+    Служебный синтаксис FTS5 из запроса не передаётся, поэтому любая
+    строка пользователя даёт корректное выражение.
+    """
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_posts(posts, query):
+    """Посты выборки, подходящие под запрос, без сканирования таблицы."""
+    words = re.findall(r'\w+', query)
+    if not is_supported():
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        return posts
+    return posts.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [match_expression(words)],
+    ))
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности для Paginator.
+
+    Поиск и ранжирование (bm25) выполняет индекс FTS5, поэтому время
+    запроса зависит от числа совпадений, а не от размера таблицы;
+    посты страницы затем читаются по первичному ключу.
+    """
+
+    def __init__(self, query, posts=None):
+        self.words = re.findall(r'\w+', query)
+        self.match = match_expression(self.words)
+        self.posts = Post.objects.all() if posts is None else posts
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not is_supported():
+            return self.fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def fallback(self):
+        # На базах без FTS5 поиск сводится к подстрокам в тексте.
+        posts = self.posts
+        for word in self.words:
+            posts = posts.filter(text__icontains=word)
+        return posts.order_by('-pub_date', '-pk')
+
+    def __getitem__(self, index):
+        if not self.match:
+            return []
+        if not is_supported():
+            return list(self.fallback()[index])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, 1.0, %s), rowid DESC '
+                'LIMIT %s OFFSET %s',
+                [self.match, GROUP_TITLE_WEIGHT,
+                 index.stop - index.start, index.start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        found = self.posts.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,122 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_generation
+from . import counters, images, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, **kwargs):
+    previous = instance.pk and Post.objects.filter(
+        pk=instance.pk).values_list('group_id', 'image').first()
+    instance.previous_group_id, instance.previous_image = (
+        previous or (None, None))
+    instance.image_changed = (instance.image.name or None) != (
+        instance.previous_image or None)
+    if instance.image_changed:
+        instance.thumbnails_ready = False
+        for field, value in images.image_metadata(instance.image).items():
+            setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, **kwargs):
+    if instance.image_changed:
+        thumbnails.schedule(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_image_referenced(sender, instance, **kwargs):
+    if not instance.image_changed:
+        return
+    if instance.image:
+        images.retain(instance.image.name)
+    if instance.previous_image:
+        images.release(instance.previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_released(sender, instance, **kwargs):
+    if instance.image:
+        images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        counters.bump_total_posts(1)
+    elif instance.previous_group_id != instance.group_id:
+        counters.bump_group(instance.previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+    counters.bump_total_posts(-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.user_id, 'follows_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncounted(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, 'follows_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Group)
+def feed_changed(sender, **kwargs):
+    # Сдвиг до фиксации позволил бы параллельному запросу закешировать
+    # старые данные уже под новым поколением.
+    transaction.on_commit(lambda: bump_generation('posts'))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def follows_changed(sender, instance, **kwargs):
+    key = f'follows:{instance.user_id}'
+    transaction.on_commit(lambda: bump_generation(key))
+
+
+def search_restored(sender, using, **kwargs):
+    # Подключается в PostsConfig.ready() к post_migrate приложения.
+    search.restore(connections[using])
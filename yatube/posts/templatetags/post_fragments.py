@@ -0,0 +1,56 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+POST_TEMPLATE = 'posts/includes/post.html'
+FEED_THUMBNAIL = 'feed'
+
+
+def fragment_key(post, hide_group):
+    """Ключ фрагмента: id поста и хеш всего, что выводит шаблон.
+
+    Правка поста, новый комментарий или переименование группы меняют
+    ключ, поэтому устаревший фрагмент просто перестаёт читаться.
+    """
+    author, group = post.author, post.group
+    content = repr((
+        post.text, post.pub_date, post.image.name, post.thumbnails_ready,
+        post.image_width, post.image_height,
+        post.comment_count,
+        author.username, author.first_name, author.last_name,
+        group and (group.slug, group.title), hide_group,
+    ))
+    digest = hashlib.md5(content.encode()).hexdigest()
+    return f'post_html:{post.pk}:{digest}'
+
+
+@register.simple_tag
+def post_fragments(posts, hide_group=False):
+    """HTML постов страницы; кеш читается одним get_many.
+
+    Миниатюры постов, которые приходится отрисовать заново,
+    запрашиваются пачкой до рендеринга.
+    """
+    keys = [fragment_key(post, hide_group) for post in posts]
+    found = cache.get_many(keys)
+    thumbnails.prefetch(
+        [post for key, post in zip(keys, posts) if key not in found],
+        FEED_THUMBNAIL)
+    missing = {}
+    fragments = []
+    for key, post in zip(keys, posts):
+        if key not in found:
+            missing[key] = render_to_string(
+                POST_TEMPLATE, {'post': post, 'group': hide_group})
+        fragments.append(mark_safe(found.get(key) or missing[key]))
+    if missing:
+        cache.set_many(missing, settings.POST_FRAGMENT_CACHE_TIME)
+    return fragments
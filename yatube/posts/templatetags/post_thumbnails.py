@@ -0,0 +1,16 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Готовые миниатюры поста (Picture) или None, пока фон их не создал."""
+    if not post.thumbnails_ready:
+        return None
+    prefetched = getattr(post, '_thumbnails_cache', {})
+    if size in prefetched:
+        return prefetched[size]
+    return thumbnails.lookup(post.image, size)
@@ -0,0 +1,103 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+CHANGELISTS = [
+    reverse(f'admin:posts_{model}_changelist')
+    for model in ('post', 'comment', 'follow')
+]
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.add_rows(3)
+
+    @classmethod
+    def add_rows(cls, number):
+        start = User.objects.count()
+        authors = [
+            User.objects.create_user(username=f'user_{start + i}')
+            for i in range(number)
+        ]
+        for author in authors:
+            post = Post.objects.create(
+                author=author, group=cls.group, text=f'Пост {author}')
+            Comment.objects.create(author=author, post=post, text='Ответ')
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def queries(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списка не зависит от числа строк."""
+        few = {url: len(self.queries(url)) for url in CHANGELISTS}
+        self.add_rows(10)
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertEqual(len(self.queries(url)), few[url])
+
+    def test_related_fields_are_not_selects(self):
+        """Связанные объекты не выводятся списком всех строк."""
+        post = Post.objects.first()
+        for url, value in zip(
+                CHANGELISTS, (self.group.pk, post.pk, post.author_id)):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotContains(response, f'<option value="{value}"')
+                self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_large_tables_are_not_counted(self):
+        """Размер большой таблицы берётся из статистики без COUNT."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertFalse(any(
+                    'COUNT(' in sql for sql in self.queries(url)))
+        self.assertTrue(any(
+            'COUNT(' in sql for sql in self.queries(
+                CHANGELISTS[0], author__id__exact=self.admin.pk)))
+
+    def test_post_search_uses_full_text_index(self):
+        """Поиск постов в админке идёт по индексу, а не LIKE."""
+        post = Post.objects.first()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(CHANGELISTS[0], {'q': post.text})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [post])
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in context.captured_queries))
+
+    def test_list_editable_saves_by_id(self):
+        """Связь в списке меняется вводом id объекта."""
+        post = Post.objects.order_by('pk').first()
+        other = Group.objects.create(title='Другая', slug='other')
+        posts = list(Post.objects.order_by('-pub_date', '-pk'))
+        data = {
+            'form-TOTAL_FORMS': len(posts),
+            'form-INITIAL_FORMS': len(posts),
+            '_save': 'Сохранить',
+        }
+        for i, row in enumerate(posts):
+            data[f'form-{i}-id'] = row.pk
+            data[f'form-{i}-group'] = (
+                other.pk if row == post else row.group_id)
+        response = self.client.post(CHANGELISTS[0], data)
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, other)
@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..models import (Follow, Post, StoredImage, TimelineEntry, User,
+                      UserCounter)
+from ..thumbnails import generate, lookup
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SeedBenchmarkCommandsTest(TestCase):
+    def setUp(self):
+        call_command(
+            'seed_data', users=30, groups=3, posts=120, comments=200,
+            follows_per_user=5, stdout=StringIO())
+
+    def test_seed_data_creates_consistent_data(self):
+        """seed_data создаёт данные вместе со лентами и счётчиками."""
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 120)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user).count(),
+        )
+        self.assertEqual(
+            UserCounter.objects.get(user=follow.author).followers_count,
+            Follow.objects.filter(author=follow.author).count(),
+        )
+
+    def test_benchmark_views_saves_and_compares_results(self):
+        """benchmark_views сохраняет замеры и сравнивает их с прошлыми."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'benchmark_views', requests=2, output=path, stdout=StringIO())
+            with open(path) as file:
+                results = json.load(file)
+            out = StringIO()
+            call_command(
+                'benchmark_views', requests=2, compare=path, threshold=100,
+                stdout=out)
+        self.assertIn('posts:follow_index', results)
+        self.assertIn('about:tech', results)
+        self.assertEqual(results['posts:profile_unfollow']['status'], [302])
+        self.assertIn('Регрессий не найдено', out.getvalue())
+
+
+def image_content(color):
+    file = BytesIO()
+    Image.new('RGB', (40, 30), color).save(file, 'JPEG')
+    return file.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class CollectMediaCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='collector')
+        self.kept = Post.objects.create(
+            author=user, text='Остаётся',
+            image=ContentFile(image_content('red'), name='kept.jpg'))
+        orphan = Post.objects.create(
+            author=user, text='Удаляется',
+            image=ContentFile(image_content('blue'), name='orphan.jpg'))
+        for post in (self.kept, orphan):
+            generate(post.pk)
+        self.kept_files = self.files()
+        # Удаление поста в транзакции теста не доходит до on_commit,
+        # поэтому файлы остаются на диске, как после старых правок.
+        orphan.delete()
+
+    def files(self):
+        return [
+            os.path.join(folder, name)
+            for folder, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        ]
+
+    def collect(self, **options):
+        out = StringIO()
+        call_command('collect_media', min_age=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_keeps_files(self):
+        output = self.collect(dry_run=True)
+        self.assertEqual(set(self.files()), set(self.kept_files))
+        self.assertIn('Можно удалить файлов: ', output)
+
+    def test_orphans_are_deleted_in_batches(self):
+        """Удаляются только файлы, на которые не ссылается ни один пост."""
+        orphan_files = [
+            path for path in self.kept_files
+            if not self.is_referenced(path)
+        ]
+        self.assertTrue(orphan_files)
+        reclaimed = sum(os.path.getsize(path) for path in orphan_files)
+        output = self.collect(batch_size=2)
+        self.assertEqual(
+            sorted(self.files()),
+            sorted(set(self.kept_files) - set(orphan_files)))
+        self.assertIn(
+            f'Удалено файлов: {len(orphan_files)}, '
+            f'освобождено байт: {reclaimed}.', output)
+        self.assertEqual(
+            list(StoredImage.objects.values_list('name', flat=True)),
+            [self.kept.image.name])
+        self.assertIsNotNone(lookup(self.kept.image, 'detail'))
+
+    def test_files_referenced_during_sweep_are_kept(self):
+        """Файл, на который сослался пост после разметки, не удаляется."""
+        with mock.patch(
+            'posts.management.commands.collect_media.Command.mark',
+            return_value=set(),
+        ):
+            self.collect()
+        self.assertTrue(os.path.exists(self.kept.image.path))
+
+    def is_referenced(self, path):
+        return path == self.kept.image.path or any(
+            path == self.kept.image.storage.path(file.name)
+            for size in settings.POST_THUMBNAILS
+            for file in lookup(self.kept.image, size).files.values()
+        )
+
+    def test_young_files_are_kept(self):
+        out = StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertEqual(set(self.files()), set(self.kept_files))
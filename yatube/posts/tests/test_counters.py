@@ -0,0 +1,139 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..counters import TOTAL_POSTS_KEY, get_counter, total_posts
+from ..models import Comment, Follow, Group, Post, User, UserCounter
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertCounters(self, user, posts, follows, followers):
+        counter = UserCounter.objects.get(user=user)
+        self.assertEqual(
+            (counter.posts_count, counter.follows_count,
+             counter.followers_count),
+            (posts, follows, followers),
+        )
+
+    def test_counters_follow_writes_and_deletes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertCounters(self.user, 1, 0, 1)
+        self.assertCounters(self.reader, 0, 1, 0)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertCounters(self.user, 1, 0, 0)
+        self.assertCounters(self.reader, 0, 0, 0)
+        post.delete()
+        self.assertCounters(self.user, 0, 0, 0)
+
+    def test_group_and_total_counters(self):
+        """Счётчики групп и общее число постов обновляются по записи."""
+        cache.clear()
+        group = Group.objects.create(title='Группа', slug='group')
+        other = Group.objects.create(title='Другая', slug='other')
+        self.assertEqual(total_posts(), 0)
+        post = Post.objects.create(author=self.user, text='Пост', group=group)
+        self.assertEqual(total_posts(), 1)
+        post.group = other
+        post.save()
+        group.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((group.posts_count, other.posts_count), (0, 1))
+        post.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.posts_count, 0)
+        self.assertEqual(total_posts(), 0)
+
+    def test_failed_edit_keeps_group_counters(self):
+        """Сбой при правке поста откатывает и перенос счётчика группы."""
+        old = Group.objects.create(title='Старая', slug='old')
+        new = Group.objects.create(title='Новая', slug='new')
+        post = Post.objects.create(author=self.user, text='Пост', group=old)
+        self.client.force_login(self.user)
+        bump_group = counters.bump_group
+        calls = []
+
+        def failing_bump(group_id, delta):
+            calls.append(group_id)
+            if len(calls) > 1:
+                raise RuntimeError
+            bump_group(group_id, delta)
+
+        with mock.patch('posts.signals.counters.bump_group',
+                        side_effect=failing_bump):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    reverse('posts:post_edit', args=[post.pk]),
+                    {'text': 'Правка', 'group': new.pk})
+        old.refresh_from_db()
+        self.assertEqual(old.posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.group, old)
+
+    def test_total_posts_drift_expires(self):
+        """Искажённое общее число постов пересчитывается по истечении срока."""
+        cache.clear()
+        Post.objects.create(author=self.user, text='Пост')
+        self.assertEqual(total_posts(), 1)
+        cache.incr(TOTAL_POSTS_KEY, 41)
+        self.assertEqual(total_posts(), 42)
+        later = time.time() + settings.TOTAL_POSTS_TTL + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(total_posts(), 1)
+
+    def test_user_deletion_updates_other_counters(self):
+        """Удаление пользователя уменьшает счётчики его авторов."""
+        spammer = User.objects.create_user(username='spammer')
+        post = Post.objects.create(author=spammer, text='Спам')
+        Comment.objects.create(author=self.reader, post=post, text='Ответ')
+        Follow.objects.create(user=spammer, author=self.user)
+        spammer_id = spammer.id
+        spammer.delete()
+        self.assertCounters(self.user, 0, 0, 0)
+        self.assertFalse(
+            UserCounter.objects.filter(user_id=spammer_id).exists())
+
+    def test_missing_counter_is_recounted(self):
+        """Отсутствующая строка счётчиков пересчитывается при чтении."""
+        Post.objects.bulk_create([Post(author=self.user, text='Пост')])
+        UserCounter.objects.filter(user=self.user).delete()
+        self.assertEqual(get_counter(self.user).posts_count, 1)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда rebuild_counters исправляет расхождения."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(author=self.reader, post=post, text='Комментарий'),
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.user),
+        ])
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertCounters(self.user, 1, 0, 1)
+        self.assertCounters(self.reader, 0, 1, 0)
+        self.assertIn(
+            'Расхождений в счётчиках пользователей: 2', out.getvalue())
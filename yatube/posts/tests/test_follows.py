@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import get_counter
+from ..follows import follow, follow_many, unfollow, unfollow_many
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class FollowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(5)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+            get_counter(author)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertConsistent(self):
+        following = set(Follow.objects.filter(
+            user=self.reader).values_list('author_id', flat=True))
+        self.reader.counter.refresh_from_db()
+        self.assertEqual(self.reader.counter.follows_count, len(following))
+        for author in self.authors:
+            with self.subTest(author=author.username):
+                author.counter.refresh_from_db()
+                self.assertEqual(
+                    author.counter.followers_count,
+                    int(author.pk in following))
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post__author', flat=True)),
+            following)
+
+    def statements(self, queries):
+        return [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+
+    def test_repeated_follow_is_one_statement(self):
+        """Повторная подписка — один INSERT без ошибки и без изменений."""
+        author = self.authors[0]
+        self.assertTrue(follow(self.reader, author))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(follow(self.reader, author))
+        self.assertEqual(len(self.statements(queries)), 1)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertConsistent()
+
+    def test_self_follow_is_ignored(self):
+        """На себя подписаться нельзя."""
+        self.assertFalse(follow(self.reader, self.reader))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_is_one_statement(self):
+        """Отписка — один DELETE; повторная ничего не меняет."""
+        author = self.authors[0]
+        follow(self.reader, author)
+        self.assertTrue(unfollow(self.reader, author))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(unfollow(self.reader, author))
+        self.assertEqual(len(self.statements(queries)), 1)
+        self.assertConsistent()
+
+    def test_profile_checks_follow_with_one_query(self):
+        """Профиль проверяет подписку одним запросом к подпискам."""
+        author = self.authors[0]
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:profile', args=[author.username])
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(len([
+            sql for sql in self.statements(queries)
+            if sql.startswith('SELECT (1) AS "a" FROM "posts_follow"')
+        ]), 1)
+        client.get(reverse('posts:profile_unfollow', args=[author.username]))
+        self.assertFalse(client.get(url).context['following'])
+
+    @override_settings(FOLLOW_BATCH_SIZE=2)
+    def test_bulk_follow_and_unfollow(self):
+        """Пакетные операции учитывают существующие подписки."""
+        follow(self.reader, self.authors[0])
+        self.assertEqual(follow_many(self.reader, self.authors), 4)
+        self.assertConsistent()
+        self.assertEqual(unfollow_many(self.reader, self.authors[1:4]), 3)
+        self.assertConsistent()
+        self.assertEqual(unfollow_many(self.reader, self.authors[1:4]), 0)
+        self.assertConsistent()
+
+    def test_benchmark_follows_rolls_back(self):
+        """benchmark_follows сравнивает режимы и ничего не оставляет."""
+        users = User.objects.count()
+        out = StringIO()
+        call_command('benchmark_follows', authors=5, stdout=out)
+        self.assertIn('пакетом', out.getvalue())
+        self.assertEqual(User.objects.count(), users)
+        self.assertFalse(Follow.objects.exists())
@@ -1,3 +1,5 @@
+import hashlib
+import os
 import shutil
 import tempfile
 
@@ -210,10 +212,16 @@ class PostsFormsTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
         self.assertEqual(post.author, self.user_2)
-        form_image_name = form_data['image'].name
-        self.assertEqual(post.image,
-                         f'{settings.POST_IMAGE_FOLDER_NAME}{form_image_name}'
-                         )
+        self.assertContentNamed(post.image, form_data['image'].name)
+
+    def assertContentNamed(self, image, upload_name):
+        """Файл назван хешем содержимого и лежит в каталогах по хешу."""
+        digest = hashlib.sha256(image.read()).hexdigest()
+        extension = os.path.splitext(upload_name)[1]
+        self.assertEqual(
+            image.name,
+            f'{settings.POST_IMAGE_FOLDER_NAME}'
+            f'{digest[:2]}/{digest[2:4]}/{digest}{extension}')
 
     def test_edit_post(self):
         """Валидная форма изменяет запись в Post."""
@@ -234,10 +242,7 @@ class PostsFormsTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
         self.assertEqual(post.author, self.post.author)
-        form_image_name = form_data['image'].name
-        self.assertEqual(post.image,
-                         f'{settings.POST_IMAGE_FOLDER_NAME}{form_image_name}'
-                         )
+        self.assertContentNamed(post.image, form_data['image'].name)
 
     def test_create_comment(self):
         """Валидная форма создает комментарий в Post."""
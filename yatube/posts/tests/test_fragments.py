@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Group, Post, User
+from ..templatetags.post_fragments import post_fragments
+
+
+class PostFragmentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {i}', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return list(Post.objects.select_related('author', 'group'))
+
+    def test_page_fragments_read_in_one_round_trip(self):
+        """Фрагменты страницы читаются одним обращением к кешу."""
+        first = post_fragments(self.posts())
+        with mock.patch.object(
+                cache, 'get_many', wraps=cache.get_many) as get_many, \
+                mock.patch('posts.templatetags.post_fragments.'
+                           'render_to_string') as render:
+            self.assertEqual(post_fragments(self.posts()), first)
+        get_many.assert_called_once()
+        render.assert_not_called()
+
+    def test_writes_change_fragment(self):
+        """Правка поста, комментарий и смена группы обновляют фрагмент."""
+        post = Post.objects.latest('pk')
+        post_fragments(self.posts())
+        Post.objects.filter(pk=post.pk).update(text='Исправленный пост')
+        self.assertIn('Исправленный пост', post_fragments(self.posts())[0])
+        Comment.objects.create(author=self.user, post=post, text='Ответ')
+        self.assertIn(
+            'Всего комментариев к посту: 1', post_fragments(self.posts())[0])
+        Group.objects.filter(pk=self.group.pk).update(title='Новое имя')
+        self.assertIn('Новое имя', post_fragments(self.posts())[0])
+
+    @override_settings(CACHE_TIME=1, POST_FRAGMENT_CACHE_TIME=3600)
+    def test_fragments_use_own_ttl(self):
+        """Фрагменты хранятся свой срок, а не общий CACHE_TIME."""
+        with mock.patch.object(
+                cache, 'set_many', wraps=cache.set_many) as set_many:
+            post_fragments(self.posts())
+        self.assertEqual(set_many.call_args[0][1], 3600)
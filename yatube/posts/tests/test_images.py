@@ -0,0 +1,199 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..models import Post, StoredImage, User
+from ..thumbnails import generate
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+BIG_SIZE = (6000, 4000)
+# Растр BIG_SIZE занимает 72 МБ, а полное декодирование с уменьшением
+# поднимает пик процесса больше чем на 130 МБ.
+MEMORY_BUDGET = 64 * 2 ** 20
+CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def jpeg(size, **params):
+    file = BytesIO()
+    Image.new('RGB', size, (30, 120, 200)).save(
+        file, 'JPEG', quality=50, **params)
+    return file.getvalue()
+
+
+def memory_status(name):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(name):
+                return int(line.split()[1]) * 1024
+
+
+def peak_memory_growth(func):
+    """Пик прироста RSS процесса при выполнении func."""
+    with open(CLEAR_REFS, 'w') as clear_refs:
+        clear_refs.write('5')
+    before = memory_status('VmRSS')
+    func()
+    return memory_status('VmHWM') - before
+
+
+class ImageIngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        cls.big = jpeg(BIG_SIZE, exif=exif.tobytes(), icc_profile=b'icc')
+
+    def clean(self, content, name='photo.jpeg'):
+        form = PostForm(data={'text': 'Текст'}, files={
+            'image': SimpleUploadedFile(name, content, 'image/jpeg')})
+        return form.is_valid(), form
+
+    def test_stored_image_is_capped_and_stripped(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет метаданные."""
+        valid, form = self.clean(self.big)
+        self.assertTrue(valid, form.errors)
+        image_file = form.cleaned_data['image']
+        self.assertEqual(image_file.name, 'photo.jpg')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (1280, 1920))
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertNotIn('icc_profile', image.info)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_byte_limit_checked_before_decoding(self):
+        with mock.patch('posts.images.Image') as image:
+            valid, form = self.clean(self.big)
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+        image.open.assert_not_called()
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10 ** 6)
+    def test_pixel_limit(self):
+        valid, form = self.clean(self.big)
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный JPEG даёт ошибку формы, а не исключение Pillow."""
+        content = jpeg((400, 300))
+        valid, form = self.clean(content[:len(content) // 2])
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_image')
+
+    @unittest.skipUnless(os.access(CLEAR_REFS, os.W_OK),
+                         'Нужен сброс пика памяти через /proc.')
+    def test_peak_memory_is_bounded(self):
+        """Приём большой картинки не декодирует её в полном размере."""
+        growth = peak_memory_growth(lambda: self.clean(self.big))
+        self.assertLess(growth, MEMORY_BUDGET)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+@mock.patch('posts.images.transaction.on_commit', lambda func: func())
+class StoredImagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader')
+        cls.content = jpeg((64, 48))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=None):
+        return Post.objects.create(
+            author=self.user, text='Текст',
+            image=ContentFile(content or self.content, name='photo.jpg'))
+
+    def test_duplicates_share_one_file(self):
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2')
+        folder = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(folder), [
+            os.path.basename(first.image.name)])
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 2)
+
+    def test_duplicate_upload_refreshes_mtime(self):
+        """Повторная загрузка обновляет mtime, защищая файл от сборки."""
+        path = self.create_post().image.path
+        os.utime(path, (0, 0))
+        self.create_post()
+        self.assertGreater(os.stat(path).st_mtime, 0)
+
+    def test_last_reference_deletes_file_and_thumbnails(self):
+        first, second = self.create_post(), self.create_post()
+        generate(first.pk)
+        thumbnails_folder = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertEqual([
+            files for _, _, files in os.walk(thumbnails_folder) if files
+        ], [])
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post()
+        old_path = post.image.path
+        post.image = ContentFile(jpeg((32, 32)), name='other.jpg')
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(
+            list(StoredImage.objects.values_list('name', 'references')),
+            [(post.image.name, 1)])
+
+    def test_metadata_stored_on_upload(self):
+        post = self.create_post()
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_format,
+             post.image_size),
+            (64, 48, 'JPEG', len(self.content)))
+
+    def test_rendering_does_not_open_original(self):
+        """Страницы выводят размеры картинки, не открывая её файл."""
+        post = self.create_post()
+        cache.clear()
+        with mock.patch('core.storage.ContentAddressedStorage.open',
+                        side_effect=AssertionError('файл открыт')):
+            for url in (reverse('posts:posts'),
+                        reverse('posts:post_detail', args=[post.pk])):
+                with self.subTest(url=url):
+                    self.assertContains(
+                        self.client.get(url), 'width="64" height="48"')
+
+    def test_fill_image_metadata_command(self):
+        post = self.create_post()
+        Post.objects.update(
+            image_width=None, image_height=None, image_format='',
+            image_size=None)
+        call_command('fill_image_metadata', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_format),
+            (64, 48, 'JPEG'))
@@ -0,0 +1,149 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import get_counter
+from ..models import (Comment, Follow, Group, Post, Recommendation,
+                      StoredImage, TimelineEntry, User, UserCounter)
+from ..moderation import delete_posts, delete_user
+from ..search import SearchResults
+
+
+@override_settings(MODERATION_BATCH_SIZE=2)
+class ModerationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.spammer)
+        Follow.objects.create(user=cls.spammer, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Честный')
+        cls.spam = [
+            Post.objects.create(
+                author=cls.spammer, group=cls.group, text=f'Спам {i}',
+                image=f'posts/spam_{i}.jpg' if i == 0 else '')
+            for i in range(5)
+        ]
+        for post in cls.spam[:3]:
+            Comment.objects.create(author=cls.reader, post=post, text='Ой')
+        for _ in range(3):
+            Comment.objects.create(
+                author=cls.spammer, post=cls.post, text='Купите')
+        Recommendation.objects.create(
+            user=cls.reader, author=cls.spammer, position=0, score=1)
+        for user in (cls.spammer, cls.reader, cls.author):
+            get_counter(user)
+
+    def counter(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_delete_user_removes_everything_in_batches(self):
+        """Пользователь удаляется со всеми связями пачками."""
+        self.assertTrue(StoredImage.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            delete_user(self.spammer.pk)
+        self.assertFalse(User.objects.filter(pk=self.spammer.pk).exists())
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        for model in (Comment, Follow, TimelineEntry, Recommendation):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.exists())
+        post_deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE FROM posts_post ')
+        ]
+        self.assertEqual(len(post_deletes), 3)
+        self.post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.counter(self.reader).follows_count, 0)
+        self.assertEqual(self.counter(self.author).followers_count, 0)
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertEqual(list(SearchResults('Спам')[0:10]), [])
+
+    def test_delete_posts_recounts_authors(self):
+        """Удаление части постов пересчитывает счётчики автора."""
+        self.assertEqual(delete_posts(
+            Post.objects.filter(pk__in=[post.pk for post in self.spam[:3]])),
+            3)
+        self.assertEqual(self.counter(self.spammer).posts_count, 2)
+        self.assertFalse(Comment.objects.filter(author=self.reader).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+
+class ModerationAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.spammer = User.objects.create_user(username='spammer')
+        Post.objects.create(author=cls.spammer, text='Спам')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_delete_selected_uses_moderation(self):
+        """Стандартное удаление в админке идёт через moderation."""
+        url = reverse('admin:auth_user_changelist')
+        data = {
+            'action': 'delete_selected',
+            '_selected_action': [self.spammer.pk],
+        }
+        with mock.patch('posts.moderation.delete_user') as delete:
+            response = self.client.post(url, data)
+            self.assertContains(response, self.spammer.username)
+            delete.assert_not_called()
+            self.client.post(url, {**data, 'post': 'yes'})
+        delete.assert_called_once_with(self.spammer.pk)
+
+    def test_cascaded_delete_needs_permissions(self):
+        """Без прав на посты модератор не удалит их вместе с автором."""
+        moderator = User.objects.create_user(
+            username='moderator', is_staff=True)
+        moderator.user_permissions.set(Permission.objects.filter(
+            codename__in=['view_user', 'delete_user']))
+        self.client.force_login(moderator)
+        url = reverse('admin:auth_user_changelist')
+        data = {'_selected_action': [self.spammer.pk]}
+        response = self.client.post(
+            url, {**data, 'action': 'delete_selected'})
+        self.assertEqual(
+            set(response.context['perms_lacking']),
+            {'пост', 'комментарий', 'подписка'})
+        with mock.patch('posts.admin.submit_on_commit') as submit:
+            self.client.post(url, {**data, 'action': 'delete_in_background'})
+        submit.assert_not_called()
+
+    def test_delete_in_background(self):
+        """Удаление в фоне ставит задачу после фиксации транзакции."""
+        with mock.patch('posts.admin.submit_on_commit') as submit:
+            self.client.post(reverse('admin:posts_post_changelist'), {
+                'action': 'delete_in_background',
+                '_selected_action': list(
+                    Post.objects.values_list('pk', flat=True)),
+            })
+        func, pks = submit.call_args[0]
+        func(pks)
+        self.assertFalse(Post.objects.exists())
+
+    def test_moderate_delete_command(self):
+        """moderate_delete удаляет посты и пользователей по id."""
+        post = Post.objects.create(author=self.admin, text='Пост')
+        out = StringIO()
+        call_command('moderate_delete', 'posts', str(post.pk), stdout=out)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        call_command(
+            'moderate_delete', 'users', str(self.spammer.pk), stdout=out)
+        self.assertFalse(User.objects.filter(pk=self.spammer.pk).exists())
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertIn('Удалено объектов: 1.', out.getvalue())
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_plan import QueryPlanMixin
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryPlansTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', group=cls.group)
+        Comment.objects.create(author=cls.reader, post=cls.post, text='Ответ')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def test_views_use_indexes(self):
+        """Запросы страниц не сканируют таблицы и не сортируют вручную."""
+        addresses = [
+            reverse('posts:posts'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:post_comments', args=[self.post.id]),
+            reverse('posts:follow_index'),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                cache.clear()
+                self.assertIndexedQueries(self.reader_client.get, address)
@@ -0,0 +1,122 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follows import follow
+from ..models import Follow, Recommendation, User
+from ..recommendations import FollowMatrix, rebuild
+
+
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ['reader', 'friend', 'fof_1', 'fof_2', 'fan', 'co_author']
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names}
+        for user, author in [
+            ('reader', 'friend'),
+            ('friend', 'fof_1'),
+            ('friend', 'fof_2'),
+            ('fof_1', 'reader'),
+            ('fan', 'friend'),
+            ('fan', 'co_author'),
+            ('fan', 'fof_1'),
+        ]:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def recommended(self, user):
+        return [
+            (row.author.username, row.score) for row in
+            Recommendation.objects.filter(
+                user=self.users[user]).order_by('position')
+        ]
+
+    def test_matrix_rows_match_follows(self):
+        """Строки матрицы совпадают с подписками и подписчиками."""
+        matrix = FollowMatrix.load()
+        for i, user_id in enumerate(matrix.ids):
+            with self.subTest(user_id=user_id):
+                following = matrix.following[
+                    matrix.following_ptr[i]:matrix.following_ptr[i + 1]]
+                followers = matrix.followers[
+                    matrix.followers_ptr[i]:matrix.followers_ptr[i + 1]]
+                self.assertEqual(
+                    [matrix.ids[j] for j in following],
+                    list(Follow.objects.filter(user_id=user_id).order_by(
+                        'author_id').values_list('author_id', flat=True)))
+                self.assertEqual(
+                    [matrix.ids[j] for j in followers],
+                    list(Follow.objects.filter(author_id=user_id).order_by(
+                        'user_id').values_list('user_id', flat=True)))
+                self.assertEqual(sorted(matrix.sampled_followers[
+                    matrix.followers_ptr[i]:matrix.followers_ptr[i + 1]
+                ]), list(followers))
+
+    def test_co_followers_sampled_at_random(self):
+        """Выборка подписчиков случайна, а не первые по id."""
+        pairs = [(user_id, 100) for user_id in range(1, 21)]
+        first = {
+            FollowMatrix(pairs, seed).sampled_followers[0]
+            for seed in range(10)
+        }
+        self.assertGreater(len(first), 1)
+
+    def test_scores_friends_of_friends_and_co_follows(self):
+        """Друзья друзей ценятся выше совместных подписок."""
+        self.assertEqual(rebuild(), 4)
+        self.assertEqual(
+            self.recommended('reader'),
+            [('fof_1', 3), ('fof_2', 2), ('co_author', 1)])
+        self.assertNotIn(
+            'friend', [name for name, _ in self.recommended('fan')])
+
+    @override_settings(
+        RECOMMENDATION_BATCH_SIZE=1, RECOMMENDATION_SCORE_BLOCK=2)
+    def test_rebuild_replaces_lists_per_reader(self):
+        """Пересчёт подменяет списки читателей и убирает устаревшие."""
+        rebuild()
+        Recommendation.objects.create(
+            user=self.users['co_author'], author=self.users['reader'],
+            position=0, score=1)
+        Follow.objects.filter(user=self.users['fan']).delete()
+        self.assertEqual(rebuild(), 3)
+        self.assertEqual(
+            self.recommended('reader'),
+            [('fof_1', 2), ('fof_2', 2)])
+        self.assertEqual(self.recommended('fan'), [])
+        self.assertEqual(self.recommended('co_author'), [])
+
+    @mock.patch('posts.follows.transaction.on_commit', lambda func: func())
+    def test_pages_read_precomputed_list(self):
+        """Страницы читают готовый список одним запросом."""
+        call_command('recommend_authors', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        follow_url = reverse('posts:follow_index')
+        profile_url = reverse('posts:profile', args=['friend'])
+        client.get(profile_url)
+        for url in (follow_url, profile_url):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertEqual(
+                    [author.username
+                     for author in response.context['recommendations']],
+                    ['fof_1', 'fof_2', 'co_author'])
+                self.assertEqual(len([
+                    query for query in queries.captured_queries
+                    if Recommendation._meta.db_table in query['sql']
+                ]), 1)
+        follow(self.users['reader'], self.users['fof_1'])
+        self.assertNotContains(
+            client.get(follow_url), reverse('posts:profile', args=['fof_1']))
@@ -18,6 +18,8 @@ ROUTE_URL_NAMES = [
     ['profile_follow', [USERNAME], f'/profile/{USERNAME}/follow/'],
     ['profile_unfollow', [USERNAME], f'/profile/{USERNAME}/unfollow/'],
     ['add_comment', [POST_ID], f'/posts/{POST_ID}/comment/'],
+    ['post_comments', [POST_ID], f'/posts/{POST_ID}/comments/'],
+    ['search', [], '/search/'],
 ]
 
 
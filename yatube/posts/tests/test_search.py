@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, User
+
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Рыбалка', slug='fishing', description='Описание')
+        cls.in_text = Post.objects.create(
+            author=cls.user, text='Поймал большую рыбу на рассвете')
+        cls.in_group = Post.objects.create(
+            author=cls.user, text='Просто утро', group=cls.group)
+        cls.other = Post.objects.create(author=cls.user, text='Про котов')
+
+    def found(self, query, **params):
+        response = self.client.get(SEARCH_URL, {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_search_matches_text_and_group_title(self):
+        """Поиск находит посты по словам текста и названию группы."""
+        self.assertEqual(self.found('рыбу'), [self.in_text])
+        self.assertEqual(self.found('рыб'), [self.in_text, self.in_group])
+        self.assertEqual(self.found('рыбалка'), [self.in_group])
+        self.assertEqual(self.found('ПОЙМАЛ рассвет'), [self.in_text])
+        self.assertEqual(self.found('собак'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_fts_syntax_in_query_is_harmless(self):
+        """Служебные символы FTS5 в запросе не ломают поиск."""
+        for query in ('"котов', 'котов OR', 'NEAR(котов', '*', 'котов)'):
+            with self.subTest(query=query):
+                response = self.client.get(SEARCH_URL, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при правке и удалении постов и групп."""
+        Post.objects.filter(pk=self.other.pk).update(text='Про собак')
+        self.assertEqual(self.found('собак'), [self.other])
+        self.group.title = 'Охота'
+        self.group.save()
+        self.assertEqual(self.found('охота'), [self.in_group])
+        self.group.delete()
+        self.assertEqual(self.found('охота'), [])
+        self.other.delete()
+        self.assertEqual(self.found('собак'), [])
+
+    def test_lost_triggers_restored_after_migrate(self):
+        """post_migrate возвращает триггеры, потерянные при пересборке."""
+        post = Post.objects.create(author=self.user, text='Про котят')
+        search.drop_triggers()
+        Post.objects.filter(pk=post.pk).update(text='Про собак')
+        self.assertEqual(search.missing_triggers(), list(search.TRIGGERS))
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(search.missing_triggers(), [])
+        self.assertEqual(self.found('собак'), [post])
+        Post.objects.filter(pk=post.pk).update(text='Про ежей')
+        self.assertEqual(self.found('ежей'), [post])
+
+    def test_results_ranked_and_paginated(self):
+        """Более релевантные посты идут первыми, страницы не пересекаются."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Заметка {i} ' + 'кот ' * (i % 3))
+            for i in range(12)
+        )
+        best = Post.objects.create(author=self.user, text='кот кот кот')
+        with override_settings(POST_NUMBER_ON_PAGE=4):
+            page_obj = self.client.get(
+                SEARCH_URL, {'q': 'кот'}).context['page_obj']
+            pages = list(page_obj)
+            while page_obj.has_next():
+                page_obj = self.client.get(SEARCH_URL, {
+                    'q': 'кот', 'page': page_obj.next_page_number(),
+                }).context['page_obj']
+                pages += page_obj
+        self.assertEqual(pages[0], best)
+        self.assertEqual(len(pages), len(set(pages)))
+        self.assertEqual(
+            {post.pk for post in pages},
+            set(Post.objects.filter(
+                text__contains='кот').values_list('pk', flat=True)))
+
+    def test_search_does_not_scan_posts(self):
+        """Поиск не выполняет LIKE по таблице постов."""
+        with CaptureQueriesContext(connection) as queries:
+            self.found('рыб')
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in queries.captured_queries))
+
+    def test_rebuild_search_command(self):
+        """rebuild_search заново индексирует все посты."""
+        out = StringIO()
+        call_command('rebuild_search', stdout=out)
+        self.assertIn(str(Post.objects.count()), out.getvalue())
+        self.assertEqual(self.found('рыбу'), [self.in_text])
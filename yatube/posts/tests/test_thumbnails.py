@@ -0,0 +1,200 @@
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from ..models import Post, User
+from ..thumbnails import generate, lookup, prefetch
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded_image(name='image.png', size=(64, 48)):
+    file = BytesIO()
+    Image.new('RGB', size, (200, 10, 10)).save(file, 'PNG')
+    return SimpleUploadedFile(name, file.getvalue(), 'image/png')
+
+
+def photo(size=(1200, 750)):
+    """Картинка с шумом: сжимается примерно как фотография."""
+    noise = Image.effect_noise(size, 40)
+    gradient = Image.linear_gradient('L').resize(size)
+    file = BytesIO()
+    Image.merge('RGB', (noise, gradient, noise)).save(file, 'JPEG')
+    return file.getvalue()
+
+
+def attributes(tag):
+    return dict(re.findall(r'(\w+)="([^"]*)"', tag))
+
+
+def slot_width(sizes, viewport):
+    """Ширина слота картинки по атрибуту sizes вида (min-width: Npx) Mvw."""
+    for entry in sizes.split(','):
+        condition = re.search(r'\(min-width: (\d+)px\)', entry)
+        if condition is None or viewport >= int(condition.group(1)):
+            return viewport * int(re.search(r'(\d+)vw', entry).group(1)) / 100
+
+
+def choose(srcset, width):
+    """Кандидат srcset, который выберет браузер для слота width."""
+    candidates = sorted(
+        (int(descriptor[:-1]), url) for url, descriptor in (
+            candidate.split() for candidate in srcset.split(', ')))
+    for candidate_width, url in candidates:
+        if candidate_width >= width:
+            return url
+    return candidates[-1][1]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.author = Client()
+        cls.author.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки делят файл, а KV-кеш sorl переживает
+        # откат БД между тестами.
+        cache.clear()
+
+    def create_post(self):
+        with mock.patch('posts.thumbnails.submit_on_commit') as submit:
+            self.author.post(reverse('posts:post_create'), {
+                'text': 'Пост с картинкой', 'image': uploaded_image()})
+        post = Post.objects.latest('pk')
+        submit.assert_called_once_with(generate, post.pk)
+        return post
+
+    def test_upload_schedules_thumbnails_in_background(self):
+        """Загрузка картинки ставит миниатюры в очередь, а не в шаблон."""
+        post = self.create_post()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertIsNone(lookup(post.image, 'feed'))
+        cache.clear()
+        with mock.patch('sorl.thumbnail.base.ThumbnailBackend.'
+                        'get_thumbnail') as get_thumbnail:
+            response = self.author.get(reverse('posts:posts'))
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, post.image.url)
+
+    def test_generated_thumbnails_are_rendered(self):
+        """После фоновой задачи страницы выводят готовые миниатюры."""
+        post = self.create_post()
+        generate(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNotNone(lookup(post.image, size))
+        self.assertContains(
+            self.author.get(reverse('posts:posts')),
+            lookup(post.image, 'feed').url)
+        self.assertContains(
+            self.author.get(reverse('posts:post_detail', args=[post.pk])),
+            lookup(post.image, 'detail').url)
+
+    @override_settings(POST_THUMBNAIL_FORMATS=('PNG', 'JPEG'))
+    def test_preferred_format_rendered_as_source(self):
+        """Предпочтительный формат выводится в <source> перед <img>."""
+        post = self.create_post()
+        generate(post.pk)
+        content = self.author.get(
+            reverse('posts:post_detail', args=[post.pk])).content.decode()
+        picture = re.search(r'<picture>(.*?)</picture>', content, re.S)
+        sources = re.findall(r'<source [^>]*>', picture.group(1))
+        self.assertEqual(len(sources), 1)
+        source = attributes(sources[0])
+        self.assertEqual(source['type'], 'image/png')
+        self.assertEqual(source['sizes'], settings.POST_IMAGE_SIZES['detail'])
+        for candidate in source['srcset'].split(', '):
+            url, descriptor = candidate.split()
+            self.assertTrue(url.endswith('.png'), url)
+            self.assertRegex(descriptor, r'^\d+w$')
+        img = attributes(re.search(r'<img [^>]*>', picture.group(1)).group())
+        self.assertTrue(img['src'].endswith('.jpg'), img['src'])
+
+    def test_prefetch_reads_thumbnails_in_one_query(self):
+        """Миниатюры страницы читаются из KV-хранилища одним запросом."""
+        for _ in range(3):
+            generate(self.create_post().pk)
+        posts = list(Post.objects.all())
+        default.kvstore.cache.clear()
+        with self.assertNumQueries(1):
+            prefetch(posts, 'feed')
+        with self.assertNumQueries(0):
+            prefetch(posts, 'feed')
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertEqual(
+                    post._thumbnails_cache['feed'].url,
+                    lookup(post.image, 'feed').url)
+
+    def test_generate_thumbnails_command_backfills(self):
+        """Команда generate_thumbnails создаёт недостающие миниатюры."""
+        post = self.create_post()
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class PageWeightTest(TestCase):
+    POSTS = 4
+    VIEWPORT = 1280
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='photographer')
+        content = photo()
+        for number in range(cls.POSTS):
+            post = Post.objects.create(
+                author=user, text=f'Фото {number}',
+                image=ContentFile(content, name=f'photo_{number}.jpg'))
+            generate(post.pk)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def size_of(self, url):
+        return default.storage.size(url[len(settings.MEDIA_URL):])
+
+    def test_feed_weight_reduced_by_renditions(self):
+        """Браузер с srcset скачивает ленту заметно легче одной миниатюры."""
+        cache.clear()
+        html = self.client.get(reverse('posts:posts')).content.decode()
+        pictures = re.findall(r'<picture>.*?</picture>', html, re.S)
+        self.assertEqual(len(pictures), self.POSTS)
+        single, responsive = 0, 0
+        for picture in pictures:
+            img = attributes(re.search(r'<img [^>]*>', picture).group())
+            sources = [
+                attributes(tag)
+                for tag in re.findall(r'<source [^>]*>', picture)
+            ]
+            srcset = sources[0]['srcset'] if sources else img['srcset']
+            single += self.size_of(img['src'])
+            responsive += self.size_of(choose(
+                srcset, slot_width(img['sizes'], self.VIEWPORT)))
+        self.assertLess(responsive, single * 0.7)
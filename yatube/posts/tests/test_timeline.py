@@ -0,0 +1,85 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.cache import generations
+from core.paginator import KeysetPaginator
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import FEED_KEYS, deliver, follow_feed
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка заполняет ленту, новые посты раздаются подписчикам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post', flat=True)),
+            {self.old_post.id, new_post.id},
+        )
+        self.assertEqual(
+            list(follow_feed(self.reader).order_by('pk')),
+            [self.old_post, new_post],
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertFalse(follow_feed(self.reader).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_fan_out_runs_in_background(self):
+        """Посты авторов с огромной аудиторией раздаются в фоне."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch('posts.timeline.submit_on_commit') as submit:
+            new_post = Post.objects.create(
+                author=self.author, text='Новый пост')
+        self.assertEqual(list(follow_feed(self.reader)), [self.old_post])
+        submit.assert_called_once_with(
+            deliver, new_post.pk, new_post.pub_date, self.author.pk)
+        before = generations(f'follows:{self.reader.pk}')
+        deliver(*submit.call_args[0][1:])
+        self.assertNotEqual(
+            generations(f'follows:{self.reader.pk}'), before)
+        self.assertEqual(
+            list(follow_feed(self.reader)), [new_post, self.old_post])
+
+    def test_feed_pages_follow_timeline_index(self):
+        """Страницы ленты строятся по ключам записей ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        paginator = KeysetPaginator(follow_feed(self.reader), 2, FEED_KEYS)
+        first = paginator.get_page('')
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first), [posts[2], posts[1]])
+        self.assertEqual(list(second), [posts[0], self.old_post])
+
+    @override_settings(TIMELINE_BATCH_SIZE=1)
+    def test_rebuild_timelines_restores_lost_entries(self):
+        """rebuild_timelines дополняет ленты пачками по подпискам."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        TimelineEntry.objects.filter(user=other).delete()
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertIn('Добавлено записей в ленты: 1.', out.getvalue())
+        self.assertEqual(list(follow_feed(other)), [self.old_post])
+        self.assertEqual(list(follow_feed(self.reader)), [self.old_post])
@@ -1,19 +1,22 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.cache import generations
 from ..models import Group, Post, User, Comment, Follow
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 POSTS_URL = reverse('posts:posts')
-POSTS_URL_PAGE_2 = f'{POSTS_URL}?page=2'
 POST_CREATE_URL = reverse('posts:post_create')
 USERNAME = 'auth'
 PROFILE_URL = reverse('posts:profile', args=[USERNAME])
@@ -133,54 +136,132 @@ class PostsViewsTests(TestCase):
         response = self.another.get(PROFILE_URL)
         self.assertEqual(response.context['author'], self.user)
 
+    @mock.patch('posts.signals.transaction.on_commit', lambda func: func())
     def test_index_post_list_cache(self):
-        """Главная страница кеширует список постов"""
+        """Главная страница кеширует список постов до изменения данных"""
+        cache.clear()
         response = self.guest.get(POSTS_URL)
-        Post.objects.filter(id=self.post.id).delete()
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
         self.assertEqual(
             self.guest.get(POSTS_URL).content, response.content)
-        cache.clear()
+        Post.objects.filter(id=self.post.id).delete()
         self.assertNotEqual(
             self.guest.get(POSTS_URL).content, response.content)
 
+    @mock.patch('posts.signals.transaction.on_commit', lambda func: func())
+    def test_feed_caches_invalidated_by_writes(self):
+        """Кеш лент сбрасывается сразу после записи"""
+        cache.clear()
+        cases = [
+            [GROUP_URL, self.guest],
+            [PROFILE_URL, self.guest],
+            [FOLLOW_URL, self.another],
+        ]
+        for address, client in cases:
+            with self.subTest(address=address):
+                client.get(address)
+                post = Post.objects.create(
+                    author=self.user, text='Свежий пост', group=self.group)
+                self.assertContains(client.get(address), 'Свежий пост')
+                post.delete()
+                self.assertNotContains(client.get(address), 'Свежий пост')
+
+    @mock.patch('posts.signals.transaction.on_commit', lambda func: func())
+    def test_follow_cache_invalidated_by_unfollow(self):
+        """Кеш ленты подписок сбрасывается после отписки"""
+        cache.clear()
+        self.assertContains(self.another.get(FOLLOW_URL), self.post.text)
+        Follow.objects.filter(user=self.user_2).delete()
+        self.assertNotContains(self.another.get(FOLLOW_URL), self.post.text)
+
+    def test_feed_cache_invalidated_after_commit(self):
+        """Поколение кеша сдвигается только после фиксации транзакции"""
+        callbacks = []
+        before = generations('posts')
+        with mock.patch(
+            'posts.signals.transaction.on_commit', callbacks.append
+        ):
+            Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertEqual(generations('posts'), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(generations('posts'), before)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='name')
-        cls.PROFILE_URL_PAGE_2 = f'{PROFILE_URL_2}?page=2'
-        cls.FOLLOW_URL_PAGE_2 = f'{FOLLOW_URL}?page=2'
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='slug_3',
             description='Тестовое описание',
         )
-        cls.GROUP_URL_PAGE_2 = f'{GROUP_URL_2}?page=2'
-        Post.objects.bulk_create([
-            Post(author=cls.user,
-                 text='Тестовый пост' + str(i),
-                 group=cls.group)for i in range(POST_NUMBER)
-        ])
+        for i in range(POST_NUMBER):
+            Post.objects.create(
+                author=cls.user,
+                text='Тестовый пост' + str(i),
+                group=cls.group,
+            )
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
 
     def test_first_second_page_contains_right_records(self):
         """Первая и вторая страница содержат верное количество постов"""
         cache.clear()
-        addresses = {
-            POSTS_URL: settings.POST_NUMBER_ON_PAGE,
-            GROUP_URL_2: settings.POST_NUMBER_ON_PAGE,
-            PROFILE_URL_2: settings.POST_NUMBER_ON_PAGE,
-            POSTS_URL_PAGE_2: 1,
-            self.GROUP_URL_PAGE_2: 1,
-            self.PROFILE_URL_PAGE_2: 1,
-        }
-        for address, post_number in addresses.items():
+        for address in [POSTS_URL, GROUP_URL_2, PROFILE_URL_2]:
             with self.subTest(address=address):
-                response = self.client.get(address)
+                first = self.client.get(address).context['page_obj']
                 self.assertEqual(
-                    len(response.context['page_obj']), post_number)
+                    len(first), settings.POST_NUMBER_ON_PAGE)
+                self.assertTrue(first.has_next())
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    f'{address}?cursor={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second), 1)
+                self.assertFalse(second.has_next())
+                self.assertTrue(second.has_previous())
+                self.assertNotIn(second[0], list(first))
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор назад возвращает предыдущую страницу"""
+        first = self.client.get(GROUP_URL_2).context['page_obj']
+        second = self.client.get(
+            f'{GROUP_URL_2}?cursor={first.next_cursor}').context['page_obj']
+        back = self.client.get(
+            f'{GROUP_URL_2}?cursor={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_last_cursor_returns_oldest_posts(self):
+        """Курсор последней страницы ведёт к самым старым постам"""
+        first = self.client.get(GROUP_URL_2).context['page_obj']
+        last = self.client.get(
+            f'{GROUP_URL_2}?cursor={first.last_cursor}').context['page_obj']
+        self.assertEqual(len(last), settings.POST_NUMBER_ON_PAGE)
+        self.assertEqual(last[-1], Post.objects.order_by('pub_date', 'pk')[0])
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_page_total_comes_from_counters(self):
+        """Общее число постов берётся из счётчиков"""
+        cache.clear()
+        for address in [POSTS_URL, GROUP_URL_2, PROFILE_URL_2]:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.context['page_obj'].total,
+                                 Post.objects.count())
+                self.assertContains(
+                    response, f'Всего постов: {POST_NUMBER}')
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу"""
+        first = self.client.get(GROUP_URL_2).context['page_obj']
+        response = self.client.get(f'{GROUP_URL_2}?cursor=broken')
+        self.assertEqual(list(response.context['page_obj']), list(first))
 
 
 class CommentFollowViewsTest(TestCase):
@@ -252,3 +333,217 @@ class CommentFollowViewsTest(TestCase):
         self.another.get(self.PROFILE_UNFOLLOW_URL)
         self.assertFalse(Follow.objects.filter(
             user=self.user_2, author=self.user_3).exists())
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_5',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+        cls.addresses = [
+            POSTS_URL,
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            FOLLOW_URL,
+        ]
+
+    def add_posts(self, number):
+        for i in range(number):
+            post = Post.objects.create(
+                author=self.user, text=f'Пост {i}', group=self.group)
+            Comment.objects.create(
+                author=self.reader, post=post, text=f'Комментарий {i}')
+
+    def count_queries(self, address):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client_reader.get(address)
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        self.add_posts(1)
+        single = {
+            address: self.count_queries(address)
+            for address in self.addresses
+        }
+        self.add_posts(settings.POST_NUMBER_ON_PAGE - 1)
+        for address in self.addresses:
+            with self.subTest(address=address):
+                self.assertEqual(
+                    self.count_queries(address), single[address])
+
+
+class CommentsPaginationTest(TestCase):
+    COMMENTS = settings.COMMENT_NUMBER_ON_PAGE * 2 + 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        Comment.objects.bulk_create(
+            Comment(author=cls.user, post=cls.post, text=f'Комментарий {i}')
+            for i in range(cls.COMMENTS)
+        )
+        cls.comment_ids = list(cls.post.comments.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.id])
+        cls.COMMENTS_URL = reverse(
+            'posts:post_comments', args=[cls.post.id])
+
+    def ids(self, comments):
+        return [comment.pk for comment in comments]
+
+    def test_post_detail_shows_newest_comments(self):
+        """Страница поста выводит только первую страницу комментариев."""
+        response = self.client.get(self.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(
+            self.ids(comments),
+            self.comment_ids[:settings.COMMENT_NUMBER_ON_PAGE])
+        self.assertContains(
+            response,
+            f'{self.COMMENTS_URL}?cursor={comments.next_cursor}')
+
+    def test_fragment_loads_next_comments(self):
+        """Фрагмент по курсору отдаёт следующие комментарии до конца."""
+        cursor = self.client.get(
+            self.POST_DETAIL_URL).context['comments'].next_cursor
+        loaded = self.comment_ids[:settings.COMMENT_NUMBER_ON_PAGE]
+        while cursor:
+            response = self.client.get(self.COMMENTS_URL, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            loaded += self.ids(comments)
+            cursor = comments.next_cursor
+        self.assertEqual(loaded, self.comment_ids)
+        self.assertNotContains(response, 'comments-more')
+
+    def test_comment_queries_do_not_grow(self):
+        """Авторы комментариев загружаются вместе с комментариями."""
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.POST_DETAIL_URL)
+        Comment.objects.bulk_create(
+            Comment(author=User.objects.create_user(username=f'user_{i}'),
+                    post=self.post, text='Ещё')
+            for i in range(settings.COMMENT_NUMBER_ON_PAGE)
+        )
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.POST_DETAIL_URL)
+        self.assertEqual(len(many), len(few))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.URLS = [
+            reverse('posts:posts'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.id]),
+        ]
+        cls.FOLLOW_URL = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized = Client()
+        self.authorized.force_login(self.user)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без тела."""
+        for client, urls in ((self.client, self.URLS),
+                             (self.authorized, self.URLS + [
+                                 self.FOLLOW_URL])):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+                    self.assertIn('no-cache', response['Cache-Control'])
+                    self.assertIn('Cookie', response['Vary'])
+
+    def test_authorized_pages_are_private(self):
+        """Страницы вошедшего пользователя не хранятся в общих кешах."""
+        response = self.authorized.get(self.URLS[0])
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(self.URLS[0])
+        self.assertNotIn('private', response['Cache-Control'])
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост или комментарий меняет ETag страниц."""
+        etags = {url: self.authorized.get(url)['ETag']
+                 for url in self.URLS + [self.FOLLOW_URL]}
+        Post.objects.create(author=self.author, group=self.group, text='Ещё')
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.authorized.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_viewers_get_different_etags(self):
+        """ETag зависит от зрителя, а не только от данных страницы."""
+        url = self.URLS[2]
+        self.assertNotEqual(
+            self.client.get(url)['ETag'], self.authorized.get(url)['ETag'])
+
+    def test_etag_does_not_depend_on_process_cache(self):
+        """ETag одинаков в процессах с разным содержимым кеша."""
+        for url in self.URLS + [self.FOLLOW_URL]:
+            with self.subTest(url=url):
+                etag = self.authorized.get(url)['ETag']
+                cache.clear()
+                response = self.authorized.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: None)
+    def test_edits_invalidate_etag_without_cache_bumps(self):
+        """Правка, удаление поста и смена группы меняют ETag сами по себе.
+
+        Поколения кеша после фиксации не сдвигаются, как в воркере,
+        который не видит чужой LocMemCache.
+        """
+        older = Post.objects.create(
+            author=self.author, group=self.group, text='Старый')
+        Post.objects.filter(pk=older.pk).update(
+            pub_date=self.post.pub_date.replace(year=2000))
+        writes = [
+            lambda: Post.objects.get(pk=self.post.pk).save(),
+            lambda: Comment.objects.create(
+                author=self.user, post=self.post, text='Комментарий'),
+            lambda: Group.objects.filter(pk=self.group.pk).update(
+                title='Новое имя'),
+            lambda: Post.objects.filter(pk=older.pk).delete(),
+        ]
+        for write in writes:
+            etags = {url: self.authorized.get(url)['ETag']
+                     for url in self.URLS + [self.FOLLOW_URL]}
+            write()
+            for url, etag in etags.items():
+                with self.subTest(url=url, write=writes.index(write)):
+                    response = self.authorized.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.cache import bump_generation
+from core.workers import submit_on_commit
+from .images import is_stored
+from .models import Post
+
+
+def thumbnail_options(source, options):
+    """Опции миниатюры в том виде, в каком их дополняет sorl."""
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def image_formats():
+    """Форматы миниатюр, которые умеет сохранять установленный Pillow.
+
+    Последний формат из POST_THUMBNAIL_FORMATS — запасной для <img>,
+    он нужен всегда.
+    """
+    Image.init()
+    *preferred, fallback = settings.POST_THUMBNAIL_FORMATS
+    return [fmt for fmt in preferred if fmt in Image.SAVE] + [fallback]
+
+
+def base_width(size):
+    return int(settings.POST_THUMBNAILS[size][0].split('x')[0])
+
+
+def renditions(size):
+    """(формат, ширина, геометрия, опции) всех вариантов миниатюры.
+
+    Пропорции берутся из геометрии POST_THUMBNAILS, ширины — из
+    POST_THUMBNAIL_WIDTHS и ширины самой геометрии.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, height = map(int, geometry.split('x'))
+    widths = sorted(set(settings.POST_THUMBNAIL_WIDTHS) | {width})
+    for image_format in image_formats():
+        for rendition_width in widths:
+            yield image_format, rendition_width, (
+                f'{rendition_width}x{round(rendition_width * height / width)}'
+            ), dict(options, format=image_format)
+
+
+def thumbnail_file(image, geometry, options):
+    """Файл миниатюры картинки image, имя вычисляется как в sorl."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, thumbnail_options(source, options))
+    return ImageFile(name, default.storage)
+
+
+class Picture:
+    """Готовые варианты миниатюры одной картинки для тега <picture>."""
+
+    def __init__(self, size, files):
+        self.files = files
+        self.sizes = settings.POST_IMAGE_SIZES[size]
+        fallback = image_formats()[-1]
+        self.fallback = files[fallback, base_width(size)]
+        self.url = self.fallback.url
+        self.width = self.fallback.width
+        self.height = self.fallback.height
+        self.srcset = self.format_srcset(fallback)
+        self.sources = []
+        for image_format in image_formats()[:-1]:
+            srcset = self.format_srcset(image_format)
+            if srcset:
+                self.sources.append({
+                    'type': f'image/{image_format.lower()}',
+                    'srcset': srcset,
+                })
+
+    def format_srcset(self, image_format):
+        return ', '.join(
+            f'{file.url} {width}w'
+            for (file_format, width), file in sorted(self.files.items())
+            if file_format == image_format
+        )
+
+
+def lookup_many(images, size):
+    """Готовые миниатюры картинок images: {имя картинки: Picture}.
+
+    Кеш KV-хранилища читается одним get_many, а промахи добираются
+    из его таблицы в БД одним запросом, поэтому даже холодный процесс
+    тратит на страницу ленты не больше одного запроса. Картинка без
+    запасной миниатюры в результат не попадает.
+    """
+    keys = {
+        add_prefix(thumbnail_file(image, geometry, options).key): (
+            image.name, (image_format, width))
+        for image in images if image
+        for image_format, width, geometry, options in renditions(size)
+    }
+    if not keys:
+        return {}
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        kv_cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        found.update(stored)
+    files = {}
+    for key, value in found.items():
+        if value != EMPTY_VALUE:
+            name, rendition = keys[key]
+            files.setdefault(name, {})[rendition] = deserialize_image_file(
+                value)
+    fallback = (image_formats()[-1], base_width(size))
+    return {
+        name: Picture(size, image_files)
+        for name, image_files in files.items() if fallback in image_files
+    }
+
+
+def lookup(image, size):
+    """Готовые миниатюры картинки или None; файлы не открываются."""
+    return lookup_many([image], size).get(image.name) if image else None
+
+
+def prefetch(posts, size):
+    """Запоминает в постах готовые миниатюры размера size."""
+    ready = [post for post in posts if post.thumbnails_ready]
+    found = lookup_many([post.image for post in ready], size)
+    for post in ready:
+        post._thumbnails_cache = getattr(post, '_thumbnails_cache', {})
+        post._thumbnails_cache[size] = found.get(post.image.name)
+
+
+def generate(post_id):
+    """Создаёт все миниатюры поста и отмечает их готовность."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'image_width').first()
+    if post is None or not post.image:
+        return
+    for size in settings.POST_THUMBNAILS:
+        for _, width, geometry, options in renditions(size):
+            # Варианты шире исходной картинки не несут деталей.
+            if width <= (post.image_width or 0) or width == base_width(size):
+                get_thumbnail(post.image, geometry, **options)
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnails_ready=True, updated=timezone.now())
+    if updated:
+        bump_generation('posts')
+
+
+def schedule(post):
+    """Ставит создание миниатюр в фоновый пул после фиксации."""
+    if is_stored(post.image):
+        submit_on_commit(generate, post.pk)
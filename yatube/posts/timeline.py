@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from core.cache import bump_generation
+from core.workers import submit_on_commit
+from .models import Follow, Post, TimelineEntry
+
+FEED_KEYS = ('feed_date', 'feed_post')
+
+
+def is_heavy_author(author_id):
+    """У автора больше подписчиков, чем допускает синхронная раздача."""
+    return Follow.objects.filter(author_id=author_id).order_by('pk')[
+        settings.TIMELINE_FANOUT_LIMIT:
+        settings.TIMELINE_FANOUT_LIMIT + 1
+    ].exists()
+
+
+def _insert(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in user_ids for post_id, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def _batches(values):
+    batch = []
+    for value in values.iterator():
+        batch.append(value)
+        if len(batch) == settings.TIMELINE_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def deliver(post_id, pub_date, author_id):
+    """Пачками вставляет пост в ленты всех подписчиков автора.
+
+    После каждой пачки сдвигаются поколения лент её читателей, иначе
+    закешированные страницы не увидят пост, раздача которого
+    закончилась позже фиксации публикации.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_ids in _batches(followers):
+        _insert(user_ids, [(post_id, pub_date)])
+        bump_generation(*(f'follows:{user_id}' for user_id in user_ids))
+
+
+def fan_out(post):
+    """Раздаёт новый пост в ленты подписчиков автора.
+
+    Посты авторов с очень большим числом подписчиков раздаются
+    в фоновом пуле после фиксации транзакции, чтобы одна публикация
+    не растягивала запрос на миллионы вставок. Очередь пула живёт
+    в памяти процесса: раздачи, не завершённые к его остановке,
+    теряются, и ленты дополняет команда rebuild_timelines.
+    """
+    args = (post.pk, post.pub_date, post.author_id)
+    if is_heavy_author(post.author_id):
+        submit_on_commit(deliver, *args)
+    else:
+        deliver(*args)
+
+
+def backfill(user_id, author_ids):
+    """Добавляет в ленту читателя уже опубликованные посты авторов.
+
+    Записи вставляются одним INSERT ... SELECT; уже существующие
+    записи ленты пропускаются.
+    """
+    ops = connection.ops
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{TimelineEntry._meta.db_table} (user_id, post_id, pub_date) '
+            f'SELECT %s, id, pub_date FROM {Post._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})'
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [user_id, *author_ids],
+        )
+
+
+def prune(user_id, author_ids):
+    """Убирает посты авторов из ленты читателя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids).delete()
+
+
+def follow_feed(user):
+    """Посты ленты подписок, прочитанные из материализованной ленты.
+
+    Страницы ленты нужно строить по ключам FEED_KEYS, чтобы запрос
+    шёл по индексу записей ленты читателя.
+    """
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    )
+
+
+def rebuild(using=connection):
+    """Добавляет в ленты недостающие посты по всем подпискам.
+
+    Подписки обходятся диапазонами первичного ключа по
+    TIMELINE_BATCH_SIZE, каждый диапазон — одним INSERT ... SELECT
+    в своей транзакции. Существующие записи пропускаются, поэтому
+    заполнение можно прервать и запустить заново. Возвращает число
+    добавленных записей.
+    """
+    entry, follow, post = (
+        model._meta.db_table for model in (TimelineEntry, Follow, Post))
+    ops, size = using.ops, settings.TIMELINE_BATCH_SIZE
+    with using.cursor() as cursor:
+        cursor.execute(f'SELECT MAX(id) FROM {follow}')
+        last = cursor.fetchone()[0] or 0
+    added = 0
+    for start in range(0, last, size):
+        with transaction.atomic(using=using.alias), using.cursor() as cursor:
+            cursor.execute(
+                f'{ops.insert_statement(ignore_conflicts=True)} '
+                f'{entry} (user_id, post_id, pub_date) '
+                f'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+                f'INNER JOIN {post} p ON p.author_id = f.author_id '
+                'WHERE f.id > %s AND f.id <= %s'
+                f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+                [start, start + size],
+            )
+            added += max(cursor.rowcount, 0)
+    return added
@@ -8,6 +8,9 @@ urlpatterns = [
     path('',
          views.index,
          name='posts'),
+    path('search/',
+         views.search,
+         name='search'),
     path('group/<slug:slug>/',
          views.group_posts,
          name='group_list'),
@@ -25,6 +28,9 @@ urlpatterns = [
          name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment',),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('follow/',
          views.follow_index,
          name='follow_index'),
@@ -1,51 +1,109 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
 
+from core.decorators import revalidated
+from core.paginator import KeysetPaginator
+from . import etags, follows
+from .counters import get_counter, total_posts
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import Post, Group, User
+from .recommendations import viewer_recommendations
+from .search import SearchResults
+from .timeline import FEED_KEYS, follow_feed
 
 
-def page_maker(request, object_list):
-    return Paginator(
-        object_list,
-        settings.POST_NUMBER_ON_PAGE).get_page(request.GET.get('page'))
+def feed_queryset(posts):
+    """Посты ленты со всем, что нужно шаблону, за один запрос."""
+    return posts.select_related('author', 'group')
 
 
+def page_maker(request, object_list, total=None, keys=('pub_date', 'pk')):
+    return KeysetPaginator(
+        feed_queryset(object_list),
+        settings.POST_NUMBER_ON_PAGE,
+        keys,
+    ).get_page(request.GET.get('cursor'), total)
+
+
+@revalidated(etags.index_etag)
 def index(request):
     return render(request, 'posts/index.html', {
-        'page_obj': page_maker(request, Post.objects.all())
+        'page_obj': page_maker(request, Post.objects.all(), total_posts())
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': Paginator(
+            SearchResults(query, feed_queryset(Post.objects.all())),
+            settings.POST_NUMBER_ON_PAGE,
+        ).get_page(request.GET.get('page')),
     })
 
 
+@revalidated(etags.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': page_maker(request, group.posts.all()),
+        'page_obj': page_maker(
+            request, group.posts.all(), group.posts_count),
     })
 
 
+@revalidated(etags.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = request.user.is_authenticated and author != request.user and (
-        Follow.objects.filter(user=request.user, author=author).exists())
+    author = get_object_or_404(
+        User.objects.select_related('counter'), username=username)
+    following = follows.is_following(request, author.pk)
+    counter = get_counter(author)
     return render(request, 'posts/profile.html', {
         'following': following,
         'author': author,
-        'page_obj': page_maker(request, author.posts.all()),
+        'counter': counter,
+        'recommendations': viewer_recommendations(request),
+        'page_obj': page_maker(
+            request, author.posts.all(), counter.posts_count),
     })
 
 
+def comments_page(request, post):
+    """Страница комментариев поста, начиная с самых новых."""
+    return KeysetPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENT_NUMBER_ON_PAGE,
+    ).get_page(request.GET.get('cursor'))
+
+
+@revalidated(etags.post_detail_etag)
 def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__counter', 'group'), id=post_id)
     return render(request, 'posts/post_detail.html', {
         'form': CommentForm(request.POST or None),
-        'post': get_object_or_404(Post, id=post_id),
+        'post': post,
+        'author_counter': get_counter(post.author),
+        'comments': comments_page(request, post),
+    })
+
+
+def post_comments(request, post_id):
+    """HTML следующей страницы комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    return render(request, 'posts/includes/comments.html', {
+        'post': post,
+        'comments': comments_page(request, post),
     })
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -60,6 +118,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
@@ -79,6 +138,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -91,26 +151,27 @@ def add_comment(request, post_id):
 
 
 @login_required
+@revalidated(etags.follow_etag)
 def follow_index(request):
     return render(request, 'posts/follow.html', {
         'page_obj': page_maker(
-            request, Post.objects.filter(author__following__user=request.user))
+            request, follow_feed(request.user), keys=FEED_KEYS),
+        'cache_scopes': ['posts', f'follows:{request.user.pk}'],
+        'recommendations': viewer_recommendations(request),
     })
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user, get_object_or_404(User, username=username))
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    get_object_or_404(
-        Follow,
-        user=request.user,
-        author__username=username
-    ).delete()
+    author = get_object_or_404(User, username=username)
+    if not follows.unfollow(request.user, author):
+        raise Http404('Подписка не найдена.')
     return redirect('posts:profile', username)
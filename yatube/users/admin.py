@@ -1,3 +1,18 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
+from posts import moderation
+from posts.admin import ModerationDeleteMixin
+from posts.models import Comment, Follow, Post
 
-# Register your models here.
+User = get_user_model()
+
+
+class ModeratedUserAdmin(ModerationDeleteMixin, UserAdmin):
+    delete_function = staticmethod(moderation.delete_users)
+    cascaded_models = (Post, Comment, Follow)
+
+
+admin.site.unregister(User)
+admin.site.register(User, ModeratedUserAdmin)
@@ -143,16 +143,67 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POST_NUMBER_ON_PAGE = 10
+COMMENT_NUMBER_ON_PAGE = 20
+# Таблицы больше этого размера админка не считает через COUNT.
+ESTIMATED_COUNT_THRESHOLD = 10000
+# Число постов в кеше пересчитывается хотя бы раз за этот срок, даже
+# если приращения от отменённых транзакций или других процессов
+# его исказили.
+TOTAL_POSTS_TTL = 60 * 5
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_PUBLIC_FOLDERS = ('posts/', 'cache/')
+# 'nginx' — X-Accel-Redirect на internal location MEDIA_ACCEL_PREFIX,
+# 'sendfile' — X-Sendfile, None — файл отдаёт сам Django.
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 60 * 60
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# LocMemCache у каждого процесса свой, и сдвиг поколения в одном
+# воркере не виден в других: фрагменты там живут до истечения срока.
+# Долгий срок допустим только с общим кешем (Redis, Memcached).
 CACHE_TIME = 20
+# Ключ фрагмента поста — хеш его содержимого: правка даёт новый ключ,
+# а не устаревший старый, поэтому срок может быть долгим.
+POST_FRAGMENT_CACHE_TIME = 60 * 60 * 24 * 7
 POST_IMAGE_FOLDER_NAME = 'posts/'
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 24 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_QUALITY = 85
+POST_THUMBNAILS = {
+    'feed': ('500x200', {'crop': 'center', 'upscale': True}),
+    'detail': ('500x300', {'crop': 'center', 'upscale': True}),
+}
+POST_THUMBNAIL_WIDTHS = (320, 640, 1000)
+# Последний формат — запасной для <img>, остальные идут в <source>.
+POST_THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_SIZES = {
+    'feed': '(min-width: 768px) 25vw, 100vw',
+    'detail': '(min-width: 768px) 75vw, 100vw',
+}
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BATCH_SIZE = 1000
+# Столько подписок пакетные операции записывают одним запросом.
+FOLLOW_BATCH_SIZE = 500
+RECOMMENDATIONS_PER_USER = 10
+# Баллы за автора, на которого подписан автор читателя; совместная
+# подписка с другим подписчиком тех же авторов даёт один балл.
+RECOMMENDATION_FOF_WEIGHT = 2
+RECOMMENDATION_COFOLLOW_SAMPLE = 50
+# Столько читателей оценивается одним набором вызовов NumPy.
+RECOMMENDATION_SCORE_BLOCK = 250
+RECOMMENDATION_BATCH_SIZE = 1000
+# Столько строк удаляет одна транзакция при удалении пользователей и постов.
+MODERATION_BATCH_SIZE = 500
+# При 0 фоновые задачи выполняются сразу после фиксации транзакции.
+BACKGROUND_WORKERS = 2